@@ -1,26 +1,128 @@
 import { ref } from 'vue';
-import type { WebSocketMessage } from '@/types';
+import type { Strategy, Trade, WebSocketMessage, WireCompression, WireEncoding, WireSchema } from '@/types';
+
+// Binary frames: 8-byte prefix (frame kind + padding) then either little-endian
+// float64 values (FRAME_UPDATE) or a deflated JSON message (FRAME_DEFLATE)
+const FRAME_UPDATE = 1;
+const FRAME_DEFLATE = 2;
+const FRAME_PREFIX_SIZE = 8;
 
 const ws = ref<WebSocket | null>(null);
 const messageHandlers = ref<Set<(data: WebSocketMessage) => void>>(new Set());
 
+// Layout of binary frames and the last full state they are applied to
+let schema: WireSchema | null = null;
+let lastStrategies: Strategy[] = [];
+
+// Deflated frames decode asynchronously, chain them so handlers see messages in order
+let pending: Promise<void> = Promise.resolve();
+
+const inflate = async (buffer: ArrayBuffer): Promise<string> => {
+    const stream = new Blob([buffer.slice(FRAME_PREFIX_SIZE)])
+        .stream()
+        .pipeThrough(new DecompressionStream('deflate'));
+    return new Response(stream).text();
+};
+
+const decodeFrame = (buffer: ArrayBuffer): WebSocketMessage | null => {
+    const layoutSchema = schema;
+    if (!layoutSchema || new DataView(buffer).getUint8(0) !== FRAME_UPDATE) return null;
+
+    const values = new Float64Array(buffer, FRAME_PREFIX_SIZE);
+    let offset = 0;
+
+    const header: Record<string, number> = {};
+    layoutSchema.header.forEach(field => { header[field] = values[offset++]; });
+    if (header.schemaVersion !== layoutSchema.schemaVersion) return null;
+
+    const prices: Record<string, number> = {};
+    layoutSchema.symbols.forEach(symbol => { prices[symbol] = values[offset++]; });
+
+    const fxRates: Record<string, number> = {};
+    layoutSchema.currencies.forEach(currency => { fxRates[currency] = values[offset++]; });
+
+    const baseById = new Map(lastStrategies.map(strategy => [strategy.id, strategy]));
+    const strategies: Strategy[] = [];
+    for (const layout of layoutSchema.strategies) {
+        const base = baseById.get(layout.id);
+        if (!base || base.positions.length !== layout.positions.length) return null;
+
+        const riskMetrics = { ...base.riskMetrics } as Record<string, number>;
+        let selected = base.selected;
+        layoutSchema.strategyFields.forEach(field => {
+            const value = values[offset++];
+            if (field === 'selected') {
+                selected = value !== 0;
+            } else {
+                riskMetrics[field] = value;
+            }
+        });
+
+        const positions = base.positions.map(position => {
+            const updated = { ...position } as Record<string, unknown>;
+            layoutSchema.positionFields.forEach(field => { updated[field] = values[offset++]; });
+            return updated as unknown as typeof position;
+        });
+
+        strategies.push({
+            ...base,
+            selected,
+            positions,
+            riskMetrics: riskMetrics as unknown as Strategy['riskMetrics']
+        });
+    }
+    lastStrategies = strategies;
+
+    return {
+        type: 'update',
+        data: { version: header.version, serverTime: header.serverTime, prices, fxRates, strategies }
+    };
+};
+
+const parseMessage = async (raw: string | ArrayBuffer): Promise<WebSocketMessage | null> => {
+    if (raw instanceof ArrayBuffer) {
+        if (new DataView(raw).getUint8(0) !== FRAME_DEFLATE) {
+            return decodeFrame(raw);
+        }
+        raw = await inflate(raw);
+    }
+
+    const message = JSON.parse(raw);
+    if (message.type === 'schema') {
+        schema = message.data as WireSchema;
+        return null;
+    }
+    if (message.data?.strategies) {
+        lastStrategies = message.data.strategies;
+    }
+    return message as WebSocketMessage;
+};
+
 export function useWebSocket() {
-    const connect = () => {
+    const connect = (encoding: WireEncoding = 'binary', compression: WireCompression = 'deflate') => {
         if (ws.value) return;
 
-        ws.value = new WebSocket('ws://localhost:9001/ws');
+        schema = null;
+        lastStrategies = [];
+        pending = Promise.resolve();
+        ws.value = new WebSocket(`ws://localhost:9001/ws?encoding=${encoding}&compress=${compression}`);
+        ws.value.binaryType = 'arraybuffer';
 
         ws.value.onopen = () => {
             console.log('WebSocket connected');
         };
 
         ws.value.onmessage = (event) => {
-            try {
-                const data = JSON.parse(event.data) as WebSocketMessage;
-                messageHandlers.value.forEach(handler => handler(data));
-            } catch (error) {
-                console.error('Error parsing WebSocket message:', error);
-            }
+            pending = pending.then(async () => {
+                try {
+                    const data = await parseMessage(event.data);
+                    if (data) {
+                        messageHandlers.value.forEach(handler => handler(data));
+                    }
+                } catch (error) {
+                    console.error('Error parsing WebSocket message:', error);
+                }
+            });
         };
 
         ws.value.onerror = (error) => {
@@ -54,6 +156,15 @@ export function useWebSocket() {
         }
     };
 
+    const bookTrade = (trade: Trade) => {
+        if (ws.value?.readyState === WebSocket.OPEN) {
+            ws.value.send(JSON.stringify({
+                type: 'book_trade',
+                trade
+            }));
+        }
+    };
+
     const cleanup = () => {
         disconnect();
         messageHandlers.value.clear();
@@ -64,8 +175,9 @@ export function useWebSocket() {
         disconnect,
         onUpdate,
         toggleStrategy,
+        bookTrade,
         cleanup
     };
 }
 
-export const websocketService = useWebSocket(); 
\ No newline at end of file
+export const websocketService = useWebSocket();
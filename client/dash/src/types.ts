@@ -15,6 +15,8 @@ export interface Position {
     lastPrice: number;
     openingPrice: number;
     entryPrice: number;
+    openingFx: number;  // Quote to reporting currency rate at the open
+    entryFx: number;    // Quote to reporting currency rate at entry
     positionValue: number;
 }
 
@@ -25,6 +27,8 @@ export interface RiskMetrics {
     exposure: number;
     riskLimit: number;
     volatility: number;
+    dailyPnL: number;   // Reporting currency
+    totalPnL: number;   // Reporting currency
 }
 
 export interface Strategy {
@@ -33,13 +37,56 @@ export interface Strategy {
     selected: boolean;
     positions: Position[];
     riskMetrics: RiskMetrics;
+    reportingCurrency: string;
+}
+
+export interface Trade {
+    strategyId: number;
+    symbol: string;
+    action?: 'add' | 'amend' | 'close';
+    quantity?: number;
+    price?: number;
+}
+
+export interface RollupNode {
+    nodeId: string;
+    level: 'firm' | 'desk' | 'portfolio' | 'strategy';
+    name: string;
+    parent: string | null;
+    exposure: number;
+    netExposure: number;
+    dailyPnL: number;
+    totalPnL: number;
+    var95: number;
+    var99: number;
+}
+
+export type WireEncoding = 'json' | 'binary';
+
+export type WireCompression = 'none' | 'deflate';
+
+export interface WireSchema {
+    schemaVersion: number;
+    header: string[];
+    symbols: string[];
+    currencies: string[];
+    strategyFields: string[];
+    positionFields: string[];
+    strategies: { id: number; positions: string[] }[];
 }
 
 export interface WebSocketMessage {
-    type: 'initial' | 'update' | 'toggle';
+    type: 'initial' | 'update' | 'toggle' | 'trade_booked' | 'trade_rejected' | 'rollup';
     data: {
+        version?: number;
+        serverTime?: number;
         strategies?: Strategy[];
         strategyId?: number;
         prices?: Record<string, number>;
+        fxRates?: Record<string, number>;
+        symbol?: string;
+        position?: Position | null;
+        error?: string;
+        nodes?: RollupNode[];
     };
 } 
\ No newline at end of file
@@ -0,0 +1,128 @@
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Sequence
+import logging
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.special import xlogy
+from scipy.stats import chi2
+from models import Strategy
+
+logger = logging.getLogger(__name__)
+
+# Rows of rolling windows processed at once, bounds the memory of the quantile copy
+CHUNK_ROWS = 8192
+
+
+def strategy_quantities(strategies: List[Strategy], symbols: List[str]) -> np.ndarray:
+    """Quantity matrix (symbols x strategies) of the current book"""
+    index = {symbol: i for i, symbol in enumerate(symbols)}
+    quantities = np.zeros((len(symbols), len(strategies)))
+    for j, strategy in enumerate(strategies):
+        for position in strategy["positions"]:
+            quantities[index[position["instrument"]["internalCode"]], j] += position["quantity"]
+    return quantities
+
+
+def rolling_var_es(pnl: np.ndarray, window: int, confidence: float):
+    """Rolling historical VaR and ES forecasts for each day after the first window.
+
+    The forecast for day t only uses P&L of days t-window..t-1. Both are
+    returned as positive losses.
+    """
+    windows = sliding_window_view(pnl[:-1], window)
+    alpha = 1.0 - confidence
+    var = np.empty(len(windows))
+    es = np.empty(len(windows))
+    for start in range(0, len(windows), CHUNK_ROWS):
+        chunk = windows[start:start + CHUNK_ROWS]
+        quantile = np.quantile(chunk, alpha, axis=1)
+        tail = chunk <= quantile[:, None]
+        var[start:start + CHUNK_ROWS] = -quantile
+        es[start:start + CHUNK_ROWS] = -np.sum(chunk * tail, axis=1) / np.maximum(tail.sum(axis=1), 1)
+    return var, es
+
+
+def kupiec_test(exceptions: np.ndarray, confidence: float) -> Dict[str, float]:
+    """Kupiec proportion-of-failures likelihood ratio test"""
+    n = len(exceptions)
+    x = int(exceptions.sum())
+    p = 1.0 - confidence
+    observed = x / n if n else 0.0
+    log_null = xlogy(n - x, 1 - p) + xlogy(x, p)
+    log_alt = xlogy(n - x, 1 - observed) + xlogy(x, observed)
+    lr = float(-2.0 * (log_null - log_alt))
+    return {"lr": lr, "pValue": float(chi2.sf(lr, 1))}
+
+
+def christoffersen_test(exceptions: np.ndarray) -> Dict[str, float]:
+    """Christoffersen independence test on exception clustering"""
+    previous, current = exceptions[:-1], exceptions[1:]
+    n00 = int(np.sum(~previous & ~current))
+    n01 = int(np.sum(~previous & current))
+    n10 = int(np.sum(previous & ~current))
+    n11 = int(np.sum(previous & current))
+
+    pi01 = n01 / (n00 + n01) if n00 + n01 else 0.0
+    pi11 = n11 / (n10 + n11) if n10 + n11 else 0.0
+    total = n00 + n01 + n10 + n11
+    pi = (n01 + n11) / total if total else 0.0
+
+    log_null = xlogy(n00 + n10, 1 - pi) + xlogy(n01 + n11, pi)
+    log_alt = xlogy(n00, 1 - pi01) + xlogy(n01, pi01) + xlogy(n10, 1 - pi11) + xlogy(n11, pi11)
+    lr = float(-2.0 * (log_null - log_alt))
+    return {"lr": lr, "pValue": float(chi2.sf(lr, 1))}
+
+
+def backtest_pnl(pnl: np.ndarray, window: int, confidences: Sequence[float]) -> Dict[str, Dict]:
+    """Backtest rolling historical VaR/ES of one P&L series"""
+    realized = pnl[window:]
+    results = {}
+    for confidence in confidences:
+        var, es = rolling_var_es(pnl, window, confidence)
+        exceptions = realized < -var
+        kupiec = kupiec_test(exceptions, confidence)
+        christoffersen = christoffersen_test(exceptions)
+        conditional_lr = kupiec["lr"] + christoffersen["lr"]
+        results[f"{confidence:g}"] = {
+            "observations": int(len(exceptions)),
+            "exceptions": int(exceptions.sum()),
+            "expectedExceptions": float(len(exceptions) * (1.0 - confidence)),
+            "lastVar": float(var[-1]),
+            "lastEs": float(es[-1]),
+            "averageVar": float(var.mean()),
+            "averageEs": float(es.mean()),
+            "kupiec": kupiec,
+            "christoffersen": christoffersen,
+            "conditionalCoverage": {"lr": conditional_lr, "pValue": float(chi2.sf(conditional_lr, 2))}
+        }
+    return results
+
+
+def run_backtest(strategies: List[Strategy], symbols: List[str], prices: np.ndarray,
+                 window: int = 250, confidences: Sequence[float] = (0.95, 0.99),
+                 executor: Optional[Executor] = None) -> List[Dict]:
+    """Replay a price history (time x symbols) against the current book.
+
+    P&L of every strategy is the historical price change applied to today's
+    quantities, computed for the whole book with one matrix product. The
+    per-strategy backtests then run on the given executor, a long-lived
+    process pool owned by the caller, or in this thread without one.
+    """
+    if window < 1:
+        raise ValueError(f"Backtest window must be at least 1, got {window}")
+    if len(prices) <= window + 1:
+        raise ValueError(f"Need more than {window + 1} prices to backtest, got {len(prices)}")
+
+    pnl = np.diff(prices, axis=0) @ strategy_quantities(strategies, symbols)
+    series = [np.ascontiguousarray(pnl[:, j]) for j in range(len(strategies))]
+    logger.info("Backtesting %d strategies over %d observations", len(strategies), len(pnl))
+
+    if executor is None:
+        results = [backtest_pnl(s, window, confidences) for s in series]
+    else:
+        results = list(executor.map(backtest_pnl, series, [window] * len(series), [confidences] * len(series)))
+
+    return [
+        {"strategyId": strategy["id"], "name": strategy["name"], "results": result}
+        for strategy, result in zip(strategies, results)
+    ]
@@ -0,0 +1,239 @@
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+import numpy as np
+from scipy.stats import norm
+from models import (
+    BASE_CURRENCY, FinancialInstrument, FxRates, Position, RISK_METRIC_FIELDS, Strategy, StrategyLayout, Trade,
+    TradeAction
+)
+
+logger = logging.getLogger(__name__)
+
+VAR_Z95 = norm.ppf(0.95)
+VAR_Z99 = norm.ppf(0.99)
+
+
+class TradeError(ValueError):
+    """Raised when a trade cannot be booked"""
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+def revalue(layouts: Tuple[StrategyLayout, ...], prices: np.ndarray,
+            symbol_metrics: Dict[str, np.ndarray], risk_limits: Optional[np.ndarray] = None,
+            fx: Optional[FxRates] = None, volatility: Optional[np.ndarray] = None) -> np.ndarray:
+    """Risk metrics (strategies x RISK_METRIC_FIELDS) from per-symbol arrays.
+
+    Monetary metrics are in each strategy's reporting currency: prices and
+    per-symbol VaR are converted to the base currency once for the whole
+    book, then scaled by the strategy's reporting rate. P&L is the change in
+    reporting-currency value since the open or entry, so it includes the FX
+    translation of positions quoted in another currency.
+    Given each strategy's P&L volatility from the risk model, VaR is the
+    parametric portfolio VaR over the covariance of symbols and currencies;
+    without it, the exposure weighted historical VaR of its symbols.
+    riskLimit comes from the configured exposure limit of each strategy,
+    falling back to 150% of exposure where none is set (NaN). Only reads
+    immutable layouts and arrays, so it is safe to run off the event loop.
+    """
+    metrics = np.zeros((len(layouts), len(RISK_METRIC_FIELDS)))
+    columns = {field: i for i, field in enumerate(RISK_METRIC_FIELDS)}
+    symbol_fx = fx.symbol_fx if fx is not None else np.ones(len(prices))
+    reporting_fx = fx.reporting_fx if fx is not None else np.ones(len(layouts))
+    base_prices = prices * symbol_fx
+    base_var95 = symbol_metrics["var95"] * symbol_fx
+    base_var99 = symbol_metrics["var99"] * symbol_fx
+    for j, layout in enumerate(layouts):
+        indices = layout.indices
+        exposures = np.abs(layout.quantities * base_prices[indices]) / reporting_fx[j]
+        total_exposure = exposures.sum()
+        weights = exposures / total_exposure if total_exposure > 0 else exposures
+        row = metrics[j]
+        if volatility is not None:
+            row[columns["var95"]] = VAR_Z95 * volatility[j]
+            row[columns["var99"]] = VAR_Z99 * volatility[j]
+        else:
+            row[columns["var95"]] = weights @ base_var95[indices] / reporting_fx[j]
+            row[columns["var99"]] = weights @ base_var99[indices] / reporting_fx[j]
+        row[columns["maxDrawdown"]] = symbol_metrics["max_drawdown"][indices].max() if len(indices) else 0.0
+        row[columns["exposure"]] = total_exposure
+        has_limit = risk_limits is not None and not np.isnan(risk_limits[j])
+        row[columns["riskLimit"]] = risk_limits[j] if has_limit else total_exposure * 1.5
+        row[columns["volatility"]] = weights @ symbol_metrics["volatility"][indices]
+        value = layout.quantities @ base_prices[indices] / reporting_fx[j]
+        row[columns["dailyPnL"]] = value - layout.quantities @ (layout.opening_prices * layout.opening_fx)
+        row[columns["totalPnL"]] = value - layout.quantities @ (layout.entry_prices * layout.entry_fx)
+    return metrics
+
+
+class Book:
+    """Strategies and positions, with dirty tracking of what trades touched.
+
+    The strategy dicts are the mutable definitions, only changed on the event
+    loop by trades and toggles. Revaluation works on immutable StrategyLayouts
+    instead; booking a trade marks its strategy and symbol dirty and the next
+    tick rebuilds the layouts of dirty strategies and the held-symbol mask,
+    everything else reuses what it had.
+    """
+
+    def __init__(self, strategies: List[Strategy], instruments: Dict[str, FinancialInstrument], symbols: List[str],
+                 fx_rates: Optional[Dict[str, float]] = None):
+        self.strategies = strategies
+        # Positions loaded without FX rates were opened and entered at the given rates
+        for strategy in strategies:
+            for position in strategy["positions"]:
+                rate = self._fx(strategy, position["instrument"], fx_rates)
+                position.setdefault("openingFx", rate)
+                position.setdefault("entryFx", rate)
+        self.instruments = instruments
+        self.symbols = list(symbols)
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.dirty_strategies: Set[int] = {strategy["id"] for strategy in strategies}
+        self.dirty_symbols: Set[str] = set(self.symbols)
+        self._layouts: Dict[int, StrategyLayout] = {}
+        self._held = np.zeros(len(self.symbols), dtype=bool)
+
+    def get_strategy(self, strategy_id: int) -> Strategy:
+        for strategy in self.strategies:
+            if strategy["id"] == strategy_id:
+                return strategy
+        raise TradeError(f"Unknown strategy {strategy_id}")
+
+    @staticmethod
+    def _fx(strategy: Strategy, instrument: FinancialInstrument, fx_rates: Optional[Dict[str, float]]) -> float:
+        """Rate converting the instrument's quote currency into the strategy's reporting currency"""
+        if fx_rates is None:
+            return 1.0
+        return fx_rates[instrument["currency"]] / fx_rates[strategy.get("reportingCurrency", BASE_CURRENCY)]
+
+    def book_trade(self, trade: Trade, prices: Dict[str, float], opening_prices: Dict[str, float],
+                   fx_rates: Optional[Dict[str, float]] = None,
+                   opening_fx_rates: Optional[Dict[str, float]] = None) -> Optional[Position]:
+        """Apply a trade and return the resulting position (None once closed).
+
+        FX rates are in base currency per unit of each currency, without them
+        every currency converts one to one.
+        """
+        strategy = self.get_strategy(trade.strategyId)
+        if trade.symbol not in self.symbol_index:
+            raise TradeError(f"Unknown instrument {trade.symbol}")
+        price = trade.price if trade.price is not None else prices[trade.symbol]
+        if price <= 0:
+            raise TradeError(f"Invalid price {price}")
+
+        instrument = self.instruments[trade.symbol]
+        fx = self._fx(strategy, instrument, fx_rates)
+        positions = strategy["positions"]
+        position = next((p for p in positions if p["instrument"]["internalCode"] == trade.symbol), None)
+
+        if trade.action == TradeAction.ADD:
+            if not trade.quantity:
+                raise TradeError("Trade quantity is required and cannot be zero")
+            if position is None:
+                opening_fx = self._fx(strategy, instrument, opening_fx_rates or fx_rates)
+                position = self._new_position(
+                    trade.symbol, trade.quantity, price, fx, prices, opening_prices, opening_fx
+                )
+                positions.append(position)
+            else:
+                self._apply_fill(position, trade.quantity, price, fx)
+        elif position is None:
+            raise TradeError(f"No {trade.symbol} position in strategy {strategy['name']}")
+        elif trade.action == TradeAction.AMEND:
+            if trade.quantity is None and trade.price is None:
+                raise TradeError("Amend needs a quantity or a price")
+            if trade.quantity is not None:
+                position["quantity"] = trade.quantity
+            if trade.price is not None:
+                position["entryPrice"] = trade.price
+        else:
+            position["quantity"] = 0.0
+
+        if position["quantity"] == 0:
+            positions.remove(position)
+            position = None
+
+        self.dirty_strategies.add(strategy["id"])
+        self.dirty_symbols.add(trade.symbol)
+        logger.info("Booked %s %s %s in %s", trade.action.value, trade.quantity, trade.symbol, strategy["name"])
+        return position
+
+    def _new_position(self, symbol: str, quantity: float, price: float, fx: float,
+                      prices: Dict[str, float], opening_prices: Dict[str, float], opening_fx: float) -> Position:
+        return {
+            "instrument": self.instruments[symbol],
+            "quantity": quantity,
+            "dailyPnL": 0.0,
+            "totalPnL": 0.0,
+            "lastPrice": prices[symbol],
+            "openingPrice": opening_prices[symbol],
+            "entryPrice": price,
+            "openingFx": opening_fx,
+            "entryFx": fx
+        }
+
+    @staticmethod
+    def _apply_fill(position: Position, quantity: float, price: float, fx: float) -> None:
+        """Add a fill to a position, averaging the entry price and rate when it grows.
+
+        The entry rate is averaged over the quote-currency cost, so the entry
+        price times the entry rate stays the average reporting-currency cost.
+        """
+        old = position["quantity"]
+        new = old + quantity
+        if old == 0 or (old > 0) == (quantity > 0):
+            # Adding to the position
+            old_cost, cost = old * position["entryPrice"], quantity * price
+            position["entryPrice"] = (old_cost + cost) / new
+            position["entryFx"] = (old_cost * position["entryFx"] + cost * fx) / (old_cost + cost)
+        elif new != 0 and (new > 0) != (old > 0):
+            # Flipped through flat, the remainder was entered at this price and rate
+            position["entryPrice"] = price
+            position["entryFx"] = fx
+        position["quantity"] = new
+
+    def toggle(self, strategy_id: int) -> Strategy:
+        """Flip the selected flag of a strategy"""
+        strategy = self.get_strategy(strategy_id)
+        strategy["selected"] = not strategy["selected"]
+        return strategy
+
+    def selection(self, layouts: Tuple[StrategyLayout, ...]) -> np.ndarray:
+        """Selected flags in layout order"""
+        return np.array([self.get_strategy(layout.id)["selected"] for layout in layouts], dtype=bool)
+
+    def layouts(self) -> Tuple[StrategyLayout, ...]:
+        """Immutable layouts of all strategies, rebuilding only the dirty ones"""
+        for strategy in self.strategies:
+            strategy_id = strategy["id"]
+            if strategy_id in self.dirty_strategies or strategy_id not in self._layouts:
+                positions = tuple(dict(p) for p in strategy["positions"])
+                self._layouts[strategy_id] = StrategyLayout(
+                    id=strategy_id,
+                    name=strategy["name"],
+                    positions=positions,
+                    indices=_read_only(np.array(
+                        [self.symbol_index[p["instrument"]["internalCode"]] for p in positions], dtype=np.intp
+                    )),
+                    quantities=_read_only(np.array([p["quantity"] for p in positions], dtype=float)),
+                    opening_prices=_read_only(np.array([p["openingPrice"] for p in positions], dtype=float)),
+                    entry_prices=_read_only(np.array([p["entryPrice"] for p in positions], dtype=float)),
+                    opening_fx=_read_only(np.array([p["openingFx"] for p in positions], dtype=float)),
+                    entry_fx=_read_only(np.array([p["entryFx"] for p in positions], dtype=float)),
+                    currency=strategy.get("reportingCurrency", BASE_CURRENCY)
+                )
+        self.dirty_strategies.clear()
+        return tuple(self._layouts[strategy["id"]] for strategy in self.strategies)
+
+    @property
+    def held(self) -> np.ndarray:
+        """Mask of symbols with a position somewhere in the book"""
+        if self.dirty_symbols:
+            self._held = np.zeros(len(self.symbols), dtype=bool)
+            for layout in self.layouts():
+                self._held[layout.indices] = True
+            self.dirty_symbols.clear()
+        return self._held
@@ -0,0 +1,61 @@
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Optional
+from wire import FRAME_DEFLATE, frame_prefix
+
+# Compression a client can negotiate with ``/ws?compress=...``
+COMPRESSION_NONE = "none"
+COMPRESSION_DEFLATE = "deflate"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_DEFLATE)
+
+
+@dataclass
+class CompressionStats:
+    frames: int = 0          # Frames compressed
+    skipped: int = 0         # Frames below the threshold, sent as is
+    bytes_in: int = 0
+    bytes_out: int = 0
+    cpu_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "bytesIn": self.bytes_in,
+            "bytesOut": self.bytes_out,
+            "ratio": self.bytes_in / self.bytes_out if self.bytes_out else 0.0,
+            "cpuSeconds": self.cpu_seconds,
+            "cpuMicrosPerFrame": self.cpu_seconds * 1e6 / self.frames if self.frames else 0.0
+        }
+
+
+class FrameCompressor:
+    """Deflate large frames, leave small ones alone.
+
+    Every frame is a self-contained zlib stream so a client can decode any
+    frame on its own, whichever ticks it missed. The saving comes from
+    compressing once per snapshot: the same bytes go to every client that
+    asked for them.
+    """
+
+    def __init__(self, threshold: int = 1024, level: int = 6):
+        self.threshold = threshold
+        self.level = level
+        self.stats = CompressionStats()
+
+    def compress(self, text: str) -> Optional[bytes]:
+        """Return a deflate frame for text, or None if it is below the threshold"""
+        data = text.encode("utf-8")
+        if len(data) < self.threshold:
+            self.stats.skipped += 1
+            return None
+
+        start = time.thread_time()
+        frame = frame_prefix(FRAME_DEFLATE) + zlib.compress(data, self.level)
+        self.stats.cpu_seconds += time.thread_time() - start
+
+        self.stats.frames += 1
+        self.stats.bytes_in += len(data)
+        self.stats.bytes_out += len(frame)
+        return frame
@@ -0,0 +1,170 @@
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix
+from compression import FrameCompressor
+from models import FxRates, RISK_METRIC_FIELDS, StrategyLayout
+from snapshot import encode_json
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ("firm", "desk", "portfolio", "strategy")
+# Values summed from the positions below a node, and from the risk metrics of its strategies
+POSITION_FIELDS = ("exposure", "netExposure")
+STRATEGY_FIELDS = ("dailyPnL", "totalPnL", "var95", "var99")
+STRATEGY_METRICS = [RISK_METRIC_FIELDS.index(field) for field in STRATEGY_FIELDS]
+# Aggregated values of every node, in the column order of the value matrix
+ROLLUP_FIELDS = (*POSITION_FIELDS, *STRATEGY_FIELDS)
+
+
+class HierarchyConfigError(ValueError):
+    """Raised when the book hierarchy configuration is invalid"""
+
+
+def rollup_message(version: int, nodes: List[Dict]) -> str:
+    """Encoded rollup message carrying the given nodes"""
+    return encode_json({"type": "rollup", "data": {"version": version, "nodes": nodes}})
+
+
+class Hierarchy:
+    """Rolls positions up the firm -> desk -> portfolio -> strategy tree.
+
+    The tree is expanded once into a sparse (nodes x positions) matrix with
+    a one wherever a position sits below a node, so every level aggregates
+    in one multiply over the columnar position values. Each tick is compared
+    with the previous one and only the nodes that changed are returned.
+    P&L and VaR are taken from the strategies' risk metrics, so every node
+    agrees with the strategies below it and with the desk limits. All values
+    are in the base currency: positions are converted at the current rate of
+    their quote currency and strategy metrics at the current rate of their
+    reporting currency. VaR is the undiversified sum of strategy VaR.
+    """
+
+    def __init__(self, config: Dict):
+        self.firm = config.get("firm", "Firm")
+        self.desks: Dict[str, Dict[str, List[int]]] = {
+            desk: {portfolio: list(ids) for portfolio, ids in portfolios.items()}
+            for desk, portfolios in config.get("desks", {}).items()
+        }
+        self._portfolio_of: Dict[int, Tuple[str, str]] = {}
+        for desk, portfolios in self.desks.items():
+            for portfolio, ids in portfolios.items():
+                for strategy_id in ids:
+                    if strategy_id in self._portfolio_of:
+                        raise HierarchyConfigError(f"Strategy {strategy_id} is in more than one portfolio")
+                    self._portfolio_of[strategy_id] = (desk, portfolio)
+
+        self._layouts: Tuple[StrategyLayout, ...] = ()
+        self.nodes: List[Dict] = []
+        self.version = 0
+        self._values = np.zeros((0, len(ROLLUP_FIELDS)))
+        # Full-tree message of one version and its deflated frame, shared by connecting clients
+        self._status_version: Optional[int] = None
+        self._status_text = ""
+        self._status_deflated: Dict[int, Optional[bytes]] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "Hierarchy":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def desk_strategies(self) -> Dict[str, List[int]]:
+        """Strategy ids below each desk, across its portfolios"""
+        return {desk: [i for ids in portfolios.values() for i in ids] for desk, portfolios in self.desks.items()}
+
+    def _bind(self, layouts: Tuple[StrategyLayout, ...]) -> None:
+        """Expand the tree against the current strategies, only when their layouts change"""
+        if len(layouts) == len(self._layouts) and all(a is b for a, b in zip(layouts, self._layouts)):
+            return
+        self._layouts = layouts
+
+        # Nodes top down, each strategy's path lists its node and all its ancestors
+        self.nodes = [{"nodeId": "firm", "level": "firm", "name": self.firm, "parent": None}]
+        row = {"firm": 0}
+        for desk, portfolios in self.desks.items():
+            desk_id = f"desk:{desk}"
+            row[desk_id] = len(self.nodes)
+            self.nodes.append({"nodeId": desk_id, "level": "desk", "name": desk, "parent": "firm"})
+            for portfolio in portfolios:
+                portfolio_id = f"portfolio:{desk}/{portfolio}"
+                row[portfolio_id] = len(self.nodes)
+                self.nodes.append({"nodeId": portfolio_id, "level": "portfolio", "name": portfolio, "parent": desk_id})
+
+        paths_row, paths_column = [], []
+        for j, layout in enumerate(layouts):
+            if layout.id in self._portfolio_of:
+                desk, portfolio = self._portfolio_of[layout.id]
+                parent = f"portfolio:{desk}/{portfolio}"
+                path = [row["firm"], row[f"desk:{desk}"], row[parent]]
+            else:
+                logger.warning("Strategy %d is not in the hierarchy, rolling it up to the firm", layout.id)
+                parent, path = "firm", [row["firm"]]
+            path.append(len(self.nodes))
+            self.nodes.append({"nodeId": f"strategy:{layout.id}", "level": "strategy", "name": layout.name, "parent": parent})
+            paths_row.extend(path)
+            paths_column.extend([j] * len(path))
+        paths = csr_matrix((np.ones(len(paths_row)), (paths_row, paths_column)), shape=(len(self.nodes), len(layouts)))
+
+        # Flat position columns of the whole book, grouped by strategy
+        counts = np.array([len(layout.indices) for layout in layouts], dtype=np.intp)
+        position_strategy = np.repeat(np.arange(len(layouts)), counts)
+        self._position_symbol = np.concatenate([layout.indices for layout in layouts] or [np.zeros(0, np.intp)])
+        self._position_quantity = np.concatenate([layout.quantities for layout in layouts] or [np.zeros(0)])
+        n_positions = len(self._position_symbol)
+
+        strategy_sum = csr_matrix(
+            (np.ones(n_positions), (position_strategy, np.arange(n_positions))), shape=(len(layouts), n_positions)
+        )
+        self._paths = paths
+        self._rollup = (paths @ strategy_sum).tocsr()
+        self._columns = np.zeros((n_positions, len(POSITION_FIELDS)))
+        # Unknown previous values, the next update reports every node
+        self._values = np.full((len(self.nodes), len(ROLLUP_FIELDS)), np.nan)
+        logger.info("Bound hierarchy of %d nodes over %d positions", len(self.nodes), n_positions)
+
+    def update(self, version: int, layouts: Tuple[StrategyLayout, ...], prices: np.ndarray, metrics: np.ndarray,
+               fx: Optional[FxRates] = None) -> List[Dict]:
+        """Aggregate one tick and return the nodes whose values changed"""
+        self._bind(layouts)
+        quantity, symbol = self._position_quantity, self._position_symbol
+        price = prices[symbol]
+        base_quantity = quantity * fx.symbol_fx[symbol] if fx is not None else quantity
+        columns = self._columns
+        np.multiply(base_quantity, price, out=columns[:, 1])
+        np.abs(columns[:, 1], out=columns[:, 0])
+        reporting_fx = fx.reporting_fx[:, None] if fx is not None else 1.0
+        values = np.hstack((
+            self._rollup @ columns,
+            self._paths @ (metrics[:, STRATEGY_METRICS] * reporting_fx)
+        ))
+
+        changed = np.flatnonzero(np.any(values != self._values, axis=1))
+        self._values = values
+        self.version = version
+        return self._nodes(changed)
+
+    def _nodes(self, rows: np.ndarray) -> List[Dict]:
+        values = self._values[rows].tolist()
+        return [{**self.nodes[i], **dict(zip(ROLLUP_FIELDS, row))} for i, row in zip(rows.tolist(), values)]
+
+    def status(self) -> List[Dict]:
+        """Current values of every node, top down"""
+        return self._nodes(np.arange(len(self.nodes)))
+
+    def status_message(self, compressor: Optional[FrameCompressor] = None) -> Tuple[str, Optional[bytes]]:
+        """Rollup message of every node and, given a compressor, its deflate frame.
+
+        Both are built at most once per version, so clients connecting within
+        a tick reuse the same bytes.
+        """
+        if self._status_version != self.version:
+            self._status_version = self.version
+            self._status_text = rollup_message(self.version, self.status())
+            self._status_deflated = {}
+        if compressor is None:
+            return self._status_text, None
+        if self.version not in self._status_deflated:
+            self._status_deflated[self.version] = compressor.compress(self._status_text)
+        return self._status_text, self._status_deflated[self.version]
@@ -0,0 +1,304 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.linalg import cholesky, eigh, LinAlgError
+from scipy.linalg.blas import dger
+from scipy.signal import lfilter
+from scipy.sparse.linalg import eigsh
+
+# Batch indicators work on a full (time x symbols) history at once, the
+# RollingIndicators class keeps the same quantities up to date tick by tick.
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """Log returns of a (time x symbols) price array"""
+    return np.diff(np.log(prices), axis=0)
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum over the last `window` rows (fewer at the start), along axis 0"""
+    cumulative = np.cumsum(values, axis=0)
+    result = cumulative.copy()
+    result[window:] -= cumulative[:-window]
+    return result
+
+
+def _window_counts(length: int, window: int, ndim: int) -> np.ndarray:
+    counts = np.minimum(np.arange(1, length + 1), window).astype(float)
+    return counts.reshape((-1,) + (1,) * (ndim - 1))
+
+
+def momentum(returns: np.ndarray, lookback: int) -> np.ndarray:
+    """Mean log return over the last `lookback` returns"""
+    return _rolling_sum(returns, lookback) / _window_counts(len(returns), lookback, returns.ndim)
+
+
+def ewma_volatility(returns: np.ndarray, decay: float = 0.94) -> np.ndarray:
+    """RiskMetrics EWMA volatility, var_t = decay * var_t-1 + (1 - decay) * r_t^2"""
+    variance = lfilter([1.0 - decay], [1.0, -decay], returns ** 2, axis=0)
+    return np.sqrt(variance)
+
+
+def ewma_covariance(returns: np.ndarray, decay: float = 0.94, initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """RiskMetrics EWMA covariance after a (time x symbols) history, starting from `initial`"""
+    weights = (1.0 - decay) * decay ** np.arange(len(returns) - 1, -1, -1)
+    covariance = (returns * weights[:, None]).T @ returns
+    if initial is not None:
+        covariance += decay ** len(returns) * initial
+    return covariance
+
+
+def drawdown(prices: np.ndarray) -> np.ndarray:
+    """Drawdown from the running peak"""
+    return 1.0 - prices / np.maximum.accumulate(prices, axis=0)
+
+
+def max_drawdown(prices: np.ndarray) -> np.ndarray:
+    """Largest drawdown over the whole history"""
+    return drawdown(prices).max(axis=0)
+
+
+def rolling_drawdown(prices: np.ndarray, window: int) -> np.ndarray:
+    """Drawdown from the peak of the last `window` prices, once a full window is available"""
+    peaks = sliding_window_view(prices, window, axis=0).max(axis=-1)
+    return 1.0 - prices[window - 1:] / peaks
+
+
+def rolling_beta(returns: np.ndarray, market: np.ndarray, window: int) -> np.ndarray:
+    """Rolling beta of each symbol's returns to the market factor returns"""
+    market = market.reshape(-1, 1)
+    counts = _window_counts(len(returns), window, 2)
+    mean_r = _rolling_sum(returns, window) / counts
+    mean_m = _rolling_sum(market, window) / counts
+    covariance = _rolling_sum(returns * market, window) / counts - mean_r * mean_m
+    variance = _rolling_sum(market ** 2, window) / counts - mean_m ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(variance > 0, covariance / variance, 0.0)
+
+
+def rolling_correlation(returns: np.ndarray, window: int) -> np.ndarray:
+    """Rolling correlation matrices, shape (time x symbols x symbols)"""
+    counts = _window_counts(len(returns), window, 3)
+    mean = _rolling_sum(returns, window) / counts[:, :, 0]
+    cross = _rolling_sum(returns[:, :, None] * returns[:, None, :], window) / counts
+    covariance = cross - mean[:, :, None] * mean[:, None, :]
+    std = np.sqrt(np.clip(np.einsum("tii->ti", covariance), 0.0, None))
+    denominator = std[:, :, None] * std[:, None, :]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, covariance / denominator, 0.0)
+
+
+class RollingIndicators:
+    """Incremental version of the batch indicators for all symbols.
+
+    Each call to ``update`` costs O(symbols^2) for the correlations and
+    O(window x symbols) for the rolling peak, independent of history length.
+    """
+
+    def __init__(self, symbols: List[str], initial_prices: np.ndarray, window: int = 250,
+                 momentum_lookback: int = 20, decay: float = 0.94):
+        if momentum_lookback > window:
+            raise ValueError("momentum_lookback cannot exceed the window")
+        n = len(symbols)
+        self.symbols = list(symbols)
+        self.window = window
+        self.momentum_lookback = momentum_lookback
+        self.decay = decay
+        self.count = 0
+
+        self.last_prices = np.asarray(initial_prices, dtype=float).copy()
+        self.peak = self.last_prices.copy()
+        self.max_drawdown = np.zeros(n)
+        self.ewma_variance = np.zeros(n)
+
+        # Ring buffers of recent observations and running sums over them
+        self._prices = np.tile(self.last_prices, (window, 1))
+        self._returns = np.zeros((window, n))
+        self._market = np.zeros(window)
+        self._momentum_sum = np.zeros(n)
+        self._sum_r = np.zeros(n)
+        self._sum_m = 0.0
+        self._sum_mm = 0.0
+        self._sum_rm = np.zeros(n)
+        self._sum_rr = np.zeros((n, n))
+
+    def update(self, prices: np.ndarray, market_return: float = 0.0) -> None:
+        """Fold one tick of prices (and the market factor return) into the indicators"""
+        prices = np.asarray(prices, dtype=float)
+        r = np.log(prices / self.last_prices)
+        slot = self.count % self.window
+
+        # Drop the observation leaving the window before overwriting its slot
+        if self.count >= self.window:
+            old_r, old_m = self._returns[slot], self._market[slot]
+            self._sum_r -= old_r
+            self._sum_m -= old_m
+            self._sum_mm -= old_m * old_m
+            self._sum_rm -= old_r * old_m
+            self._sum_rr -= np.outer(old_r, old_r)
+        if self.count >= self.momentum_lookback:
+            self._momentum_sum -= self._returns[(self.count - self.momentum_lookback) % self.window]
+
+        self._returns[slot] = r
+        self._market[slot] = market_return
+        self._prices[slot] = prices
+        self._momentum_sum += r
+        self._sum_r += r
+        self._sum_m += market_return
+        self._sum_mm += market_return * market_return
+        self._sum_rm += r * market_return
+        self._sum_rr += np.outer(r, r)
+
+        self.ewma_variance = self.decay * self.ewma_variance + (1.0 - self.decay) * r * r
+        self.peak = np.maximum(self.peak, prices)
+        self.max_drawdown = np.maximum(self.max_drawdown, 1.0 - prices / self.peak)
+        self.last_prices = prices
+        self.count += 1
+
+    @property
+    def observations(self) -> int:
+        return min(self.count, self.window)
+
+    @property
+    def momentum(self) -> np.ndarray:
+        n = min(self.count, self.momentum_lookback)
+        return self._momentum_sum / n if n else np.zeros(len(self.symbols))
+
+    @property
+    def ewma_volatility(self) -> np.ndarray:
+        return np.sqrt(self.ewma_variance)
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        """Drawdown from the peak of the last `window` prices"""
+        return 1.0 - self.last_prices / self._prices.max(axis=0)
+
+    @property
+    def beta(self) -> np.ndarray:
+        n = self.observations
+        if n == 0:
+            return np.zeros(len(self.symbols))
+        mean_m = self._sum_m / n
+        variance = self._sum_mm / n - mean_m ** 2
+        if variance <= 0:
+            return np.zeros(len(self.symbols))
+        return (self._sum_rm / n - self._sum_r / n * mean_m) / variance
+
+    @property
+    def correlation(self) -> np.ndarray:
+        n = self.observations
+        if n == 0:
+            return np.eye(len(self.symbols))
+        mean = self._sum_r / n
+        covariance = self._sum_rr / n - np.outer(mean, mean)
+        std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+        denominator = np.outer(std, std)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(denominator > 0, covariance / denominator, 0.0)
+
+
+class EwmaCovariance:
+    """Online RiskMetrics covariance, S_t = decay * S_t-1 + (1 - decay) * r_t r_t^T.
+
+    Each update is a rank-1 O(symbols^2) step, independent of history
+    length. Consumers read a shrunk matrix, pulled towards its diagonal by
+    `shrinkage`, and its factor model covariance = F F^T + diag(specific),
+    computed lazily at most once per version: a Cholesky factor F with no
+    specific variance, or with `rank` the (size x rank) loadings of the
+    leading eigenvectors plus the specific variance they leave out, so large
+    universes get a small factor model that keeps every symbol's own variance.
+    """
+
+    def __init__(self, size: int, decay: float = 0.94, shrinkage: float = 0.0, rank: Optional[int] = None,
+                 initial: Optional[np.ndarray] = None):
+        if not 0.0 < decay < 1.0:
+            raise ValueError("decay must be between 0 and 1")
+        if not 0.0 <= shrinkage <= 1.0:
+            raise ValueError("shrinkage must be between 0 and 1")
+        if rank is not None and not 0 < rank <= size:
+            raise ValueError(f"rank must be between 1 and {size}")
+        self.size = size
+        self.decay = decay
+        self.shrinkage = shrinkage
+        self.rank = rank if rank is not None and rank < size else None
+        self.count = 0
+        self.version = 0
+        self._sum = np.array(initial, dtype=float, order="C") if initial is not None else np.zeros((size, size))
+        self._factor: Optional[np.ndarray] = None
+        self._specific: Optional[np.ndarray] = None
+        self._factor_version = -1
+
+    def update(self, returns: np.ndarray) -> None:
+        """Fold one tick of returns into the estimate"""
+        r = np.asarray(returns, dtype=float)
+        self._sum *= self.decay
+        # In-place BLAS rank-1 update on the Fortran-ordered view, no n x n temporary
+        dger(1.0 - self.decay, r, r, a=self._sum.T, overwrite_a=True)
+        self.count += 1
+        self.version += 1
+
+    @property
+    def raw(self) -> np.ndarray:
+        """Unshrunk EWMA estimate"""
+        return self._sum
+
+    def _shrunk(self) -> np.ndarray:
+        if self.shrinkage == 0.0:
+            return self._sum.copy()
+        shrunk = (1.0 - self.shrinkage) * self._sum
+        shrunk[np.diag_indices(self.size)] = np.diag(self._sum)
+        return shrunk
+
+    def _refresh_factor(self) -> None:
+        if self._factor_version != self.version:
+            self._factor, self._specific = self._compute_factor(self._shrunk())
+            self._factor_version = self.version
+
+    @property
+    def factor(self) -> np.ndarray:
+        """F of covariance = F F^T + diag(specific), (size x size) or (size x rank) when truncated"""
+        self._refresh_factor()
+        return self._factor
+
+    @property
+    def specific(self) -> np.ndarray:
+        """Variance of each factor the loadings leave out, zero without a rank"""
+        self._refresh_factor()
+        return self._specific
+
+    @property
+    def covariance(self) -> np.ndarray:
+        if self.rank is None:
+            return self._shrunk()
+        factor = self.factor
+        return factor @ factor.T + np.diag(self.specific)
+
+    @property
+    def volatility(self) -> np.ndarray:
+        return np.sqrt(np.clip(np.diag(self.covariance), 0.0, None))
+
+    @property
+    def correlation(self) -> np.ndarray:
+        covariance = self.covariance
+        std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+        denominator = np.outer(std, std)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(denominator > 0, covariance / denominator, 0.0)
+
+    def _compute_factor(self, covariance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.rank is None:
+            try:
+                return cholesky(covariance, lower=True), np.zeros(self.size)
+            except LinAlgError:
+                # Singular, e.g. a symbol that has not moved yet
+                values, vectors = eigh(covariance)
+                return vectors * np.sqrt(np.clip(values, 0.0, None)), np.zeros(self.size)
+
+        # Leading eigenpairs only, without a full decomposition
+        if self.rank < self.size - 1:
+            values, vectors = eigsh(covariance, k=self.rank, which="LA")
+        else:
+            values, vectors = eigh(covariance, subset_by_index=[self.size - self.rank, self.size - 1])
+        loadings = vectors * np.sqrt(np.clip(values, 0.0, None))
+        specific = np.clip(np.diag(covariance) - np.sum(loadings ** 2, axis=1), 0.0, None)
+        return loadings, specific
@@ -0,0 +1,186 @@
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from scipy.sparse import csr_matrix
+from models import FxRates, RISK_METRIC_FIELDS, StrategyLayout
+
+logger = logging.getLogger(__name__)
+
+# Metrics a limit can be set on, in the column order of the value matrix
+LIMIT_METRICS = ("exposure", "var99", "maxDrawdown", "concentration")
+LIMIT_SCOPES = ("strategy", "desk")
+
+
+class LimitConfigError(ValueError):
+    """Raised when the limit configuration is invalid"""
+
+
+class LimitEngine:
+    """Evaluates configured risk limits against each tick's snapshot.
+
+    Limits are expanded once into flat arrays (entity row, metric column,
+    limit value). Each tick builds an (entities x LIMIT_METRICS) value
+    matrix and checks every limit with one vectorized comparison. A limit
+    breaches above 100% utilization and only clears again below
+    (1 - hysteresis), so values hovering around the limit don't flap.
+    Strategy limits are in the strategy's reporting currency, desk limits in
+    the base currency. Desk membership comes from the book hierarchy.
+    """
+
+    def __init__(self, config: Dict, desks: Optional[Dict[str, List[int]]] = None):
+        self.hysteresis = float(config.get("hysteresis", 0.05))
+        if "desks" in config:
+            raise LimitConfigError("Desks are defined by the book hierarchy, not the limit configuration")
+        self.desks: Dict[str, List[int]] = {name: list(ids) for name, ids in (desks or {}).items()}
+        self.definitions = config.get("limits", [])
+        for definition in self.definitions:
+            if definition.get("scope") not in LIMIT_SCOPES:
+                raise LimitConfigError(f"Unknown limit scope {definition.get('scope')!r}")
+            if definition.get("metric") not in LIMIT_METRICS:
+                raise LimitConfigError(f"Unknown limit metric {definition.get('metric')!r}")
+            if not definition.get("limit", 0) > 0:
+                raise LimitConfigError(f"Limit must be positive: {definition}")
+
+        self._layouts: Tuple[StrategyLayout, ...] = ()
+        self.limits: List[Dict] = []
+        self._breached = np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_file(cls, path: str, desks: Optional[Dict[str, List[int]]] = None) -> "LimitEngine":
+        with open(path) as f:
+            return cls(json.load(f), desks)
+
+    def _bind(self, layouts: Tuple[StrategyLayout, ...], n_symbols: int) -> None:
+        """Expand the configuration against the current strategies, only when their layouts change"""
+        if len(layouts) == len(self._layouts) and all(a is b for a, b in zip(layouts, self._layouts)):
+            return
+        previous = {limit["limitId"]: breached for limit, breached in zip(self.limits, self._breached)}
+        self._layouts = layouts
+
+        strategy_row = {layout.id: j for j, layout in enumerate(layouts)}
+        desk_names = list(self.desks)
+        desk_row = {name: len(layouts) + k for k, name in enumerate(desk_names)}
+        self._desk_members = np.zeros((len(desk_names), len(layouts)))
+        for k, name in enumerate(desk_names):
+            for strategy_id in self.desks[name]:
+                if strategy_id in strategy_row:
+                    self._desk_members[k, strategy_row[strategy_id]] = 1.0
+
+        # Flat position columns of the whole book, grouped by strategy
+        counts = np.array([len(layout.indices) for layout in layouts], dtype=np.intp)
+        position_strategy = np.repeat(np.arange(len(layouts)), counts)
+        self._position_symbol = np.concatenate([layout.indices for layout in layouts] or [np.zeros(0, np.intp)])
+        self._position_quantity = np.concatenate([layout.quantities for layout in layouts] or [np.zeros(0)])
+        # Strategies holding positions and where theirs start, the only valid reduceat offsets
+        self._strategy_held = counts > 0
+        self._strategy_starts = (np.cumsum(counts) - counts)[self._strategy_held]
+        n_positions = len(self._position_symbol)
+
+        # Sparse maps from position exposures to strategy totals and to desk exposure per name
+        self._strategy_sum = csr_matrix(
+            (np.ones(n_positions), (position_strategy, np.arange(n_positions))), shape=(len(layouts), n_positions)
+        )
+        desk_of, position_of = np.nonzero(self._desk_members[:, position_strategy])
+        self._desk_by_name = csr_matrix(
+            (np.ones(len(desk_of)), (desk_of * n_symbols + self._position_symbol[position_of], position_of)),
+            shape=(len(desk_names) * n_symbols, n_positions)
+        )
+        self._n_symbols = n_symbols
+
+        # Expand wildcards into one flat limit per entity
+        self.limits = []
+        rows, columns, values = [], [], []
+        for number, definition in enumerate(self.definitions):
+            scope, entity = definition["scope"], definition["entity"]
+            index = strategy_row if scope == "strategy" else desk_row
+            entities = list(index) if entity == "*" else [entity]
+            for name in entities:
+                if name not in index:
+                    logger.warning("Limit %d refers to unknown %s %r", number, scope, name)
+                    continue
+                self.limits.append({
+                    "limitId": f"{scope}:{name}:{definition['metric']}",
+                    "scope": scope,
+                    "entity": name,
+                    "metric": definition["metric"]
+                })
+                rows.append(index[name])
+                columns.append(LIMIT_METRICS.index(definition["metric"]))
+                values.append(float(definition["limit"]))
+        self._rows = np.array(rows, dtype=np.intp)
+        self._columns = np.array(columns, dtype=np.intp)
+        self._limits = np.array(values)
+        self._values = np.zeros(len(values))
+        self._breached = np.array([previous.get(limit["limitId"], False) for limit in self.limits], dtype=bool)
+        logger.info("Bound %d risk limits to %d strategies and %d desks", len(self.limits), len(layouts), len(desk_names))
+
+    def exposure_limits(self, layouts: Tuple[StrategyLayout, ...], n_symbols: int) -> np.ndarray:
+        """Configured exposure limit per strategy, NaN where there is none"""
+        self._bind(layouts, n_symbols)
+        result = np.full(len(layouts), np.nan)
+        exposure = self._columns == LIMIT_METRICS.index("exposure")
+        strategies = self._rows < len(layouts)
+        selected = exposure & strategies
+        result[self._rows[selected]] = self._limits[selected]
+        return result
+
+    def values(self, layouts: Tuple[StrategyLayout, ...], prices: np.ndarray, metrics: np.ndarray,
+               fx: Optional[FxRates] = None) -> np.ndarray:
+        """Value matrix (strategies then desks x LIMIT_METRICS)"""
+        self._bind(layouts, len(prices))
+        base_prices = prices * fx.symbol_fx if fx is not None else prices
+        reporting_fx = fx.reporting_fx if fx is not None else np.ones(len(layouts))
+        exposures = np.abs(self._position_quantity * base_prices[self._position_symbol])
+
+        # A strategy holds each name once, its largest position is its largest name
+        strategy_totals = self._strategy_sum @ exposures / reporting_fx
+        strategy_largest = np.zeros(len(layouts))
+        if len(exposures):
+            held = self._strategy_held
+            strategy_largest[held] = np.maximum.reduceat(exposures, self._strategy_starts) / reporting_fx[held]
+        desk_by_name = (self._desk_by_name @ exposures).reshape(-1, self._n_symbols)
+
+        totals = np.concatenate((strategy_totals, desk_by_name.sum(axis=1)))
+        largest = np.concatenate((strategy_largest, desk_by_name.max(axis=1, initial=0.0)))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            concentration = np.where(totals > 0, largest / totals, 0.0)
+
+        var99 = metrics[:, RISK_METRIC_FIELDS.index("var99")]
+        drawdown = metrics[:, RISK_METRIC_FIELDS.index("maxDrawdown")]
+        desk_var99 = self._desk_members @ (var99 * reporting_fx)  # Undiversified sum of member VaR
+        desk_drawdown = (self._desk_members * drawdown).max(axis=1, initial=0.0)
+        return np.column_stack((
+            totals,
+            np.concatenate((var99, desk_var99)),
+            np.concatenate((drawdown, desk_drawdown)),
+            concentration
+        ))
+
+    def evaluate(self, version: int, layouts: Tuple[StrategyLayout, ...], prices: np.ndarray,
+                 metrics: np.ndarray, fx: Optional[FxRates] = None) -> List[Dict]:
+        """Check every limit and return breach/clear events for those that changed state"""
+        values = self.values(layouts, prices, metrics, fx)
+        self._values = values[self._rows, self._columns]
+        utilization = self._values / self._limits
+        breached = np.where(self._breached, utilization > 1.0 - self.hysteresis, utilization > 1.0)
+        changed = np.flatnonzero(breached != self._breached)
+        self._breached = breached
+        return [
+            {**self._status(i, utilization[i]), "event": "breach" if breached[i] else "clear", "version": version}
+            for i in changed
+        ]
+
+    def _status(self, i: int, utilization: float) -> Dict:
+        return {
+            **self.limits[i],
+            "value": float(self._values[i]),
+            "limit": float(self._limits[i]),
+            "utilization": float(utilization),
+            "breached": bool(self._breached[i])
+        }
+
+    def status(self) -> List[Dict]:
+        """Current value and state of every limit"""
+        utilization = self._values / self._limits if len(self._limits) else self._values
+        return [self._status(i, utilization[i]) for i in range(len(self.limits))]
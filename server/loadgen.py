@@ -0,0 +1,289 @@
+"""Synthetic WebSocket load generator for the dashboard server.
+
+Spawns many asyncio clients against ``/ws``, each toggling strategies at a
+random rate, and measures tick-to-receipt latency from the ``serverTime``
+stamped on every update. Server CPU and memory are sampled from
+``/stats/process`` while the test runs. Latency compares clocks, so run it
+on the same host as the server:
+
+    python loadgen.py --clients 2000 --duration 60 --encoding mixed
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+import urllib.request
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit, urlunsplit
+import numpy as np
+import websockets
+from compression import COMPRESSION_NONE, COMPRESSIONS
+from wire import ENCODING_BINARY, ENCODINGS, FRAME_DEFLATE, FRAME_PREFIX_SIZE, FRAME_UPDATE
+
+logger = logging.getLogger("loadgen")
+
+# JSON updates start with the version and stamp, read them without parsing the whole snapshot
+UPDATE_PREFIX = re.compile(rb'^\{"type":"update","data":\{"version":(\d+),"serverTime":([-+.\deE]+)')
+
+
+@dataclass
+class ClientStats:
+    connected: bool = False
+    failed: bool = False
+    updates: int = 0
+    late: int = 0
+    toggles: int = 0
+    bytes: int = 0
+    latencies: List[float] = field(default_factory=list)  # Milliseconds
+    versions: Set[int] = field(default_factory=set)
+    first_version: Optional[int] = None
+
+
+class LoadClient:
+    """One simulated dashboard connection"""
+
+    def __init__(self, url: str, toggle_rate: float, late_ms: float, stop: asyncio.Event):
+        self.url = url
+        self.toggle_rate = toggle_rate
+        self.late_ms = late_ms
+        self.stop = stop
+        self.stats = ClientStats()
+        self.strategy_ids: List[int] = []
+        self._header: Optional[List[str]] = None
+
+    async def run(self, server_times: Dict[int, float]) -> None:
+        try:
+            async with websockets.connect(self.url, max_size=None, compression=None, open_timeout=30) as ws:
+                self.stats.connected = True
+                receiver = asyncio.create_task(self._receive(ws, server_times))
+                toggler = asyncio.create_task(self._toggle(ws))
+                await self.stop.wait()
+                toggler.cancel()
+                receiver.cancel()
+        except Exception as e:
+            if not self.stats.connected:
+                self.stats.failed = True
+            logger.debug("Client error: %s", e)
+
+    async def _toggle(self, ws) -> None:
+        if self.toggle_rate <= 0:
+            return
+        while True:
+            await asyncio.sleep(random.expovariate(self.toggle_rate))
+            if self.strategy_ids:
+                await ws.send(json.dumps({"type": "toggle_strategy", "strategyId": random.choice(self.strategy_ids)}))
+                self.stats.toggles += 1
+
+    async def _receive(self, ws, server_times: Dict[int, float]) -> None:
+        async for message in ws:
+            received_at = time.time()
+            self.stats.bytes += len(message)
+            if isinstance(message, bytes):
+                kind = message[0]
+                if kind == FRAME_UPDATE:
+                    if self._header is not None:
+                        header = np.frombuffer(message, "<f8", count=len(self._header), offset=FRAME_PREFIX_SIZE)
+                        fields = dict(zip(self._header, header.tolist()))
+                        self._record(int(fields["version"]), fields["serverTime"], received_at, server_times)
+                    continue
+                if kind != FRAME_DEFLATE:
+                    continue
+                message = zlib.decompress(message[FRAME_PREFIX_SIZE:])
+            else:
+                message = message.encode()
+
+            match = UPDATE_PREFIX.match(message)
+            if match:
+                self._record(int(match.group(1)), float(match.group(2)), received_at, server_times)
+                continue
+            data = json.loads(message)
+            if data["type"] == "schema":
+                self._header = data["data"]["header"]
+            elif data["type"] == "initial":
+                self.strategy_ids = [strategy["id"] for strategy in data["data"]["strategies"]]
+            elif data["type"] == "update":
+                self._record(data["data"]["version"], data["data"]["serverTime"], received_at, server_times)
+
+    def _record(self, version: int, server_time: float, received_at: float, server_times: Dict[int, float]) -> None:
+        latency = (received_at - server_time) * 1000.0
+        self.stats.updates += 1
+        self.stats.latencies.append(latency)
+        self.stats.versions.add(version)
+        if self.stats.first_version is None:
+            self.stats.first_version = version
+        if latency > self.late_ms:
+            self.stats.late += 1
+        server_times[version] = server_time
+
+
+def http_base(url: str) -> str:
+    """HTTP root of the server behind a ws:// URL"""
+    parts = urlsplit(url)
+    return urlunsplit(("https" if parts.scheme == "wss" else "http", parts.netloc, "", "", ""))
+
+
+def fetch_json(url: str) -> Dict:
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return json.load(response)
+
+
+async def monitor(base: str, interval: float, stop: asyncio.Event, samples: List[Dict], loop_lag: List[float]) -> None:
+    """Sample server process stats, and this generator's own event loop lag"""
+    loop = asyncio.get_running_loop()
+    previous = None
+    started = time.time()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        loop_lag.append(max(loop.time() - expected, 0.0) * 1000.0)
+        try:
+            stats = await loop.run_in_executor(None, fetch_json, base + "/stats/process")
+        except Exception as e:
+            logger.warning("Cannot sample server stats: %s", e)
+            continue
+        cpu = None
+        if previous is not None:
+            cpu = 100.0 * (stats["cpuSeconds"] - previous["cpuSeconds"]) / max(stats["time"] - previous["time"], 1e-9)
+        samples.append({
+            "elapsed": stats["time"] - started,
+            "cpuPercent": cpu,
+            "rssMB": stats["rssBytes"] / 2 ** 20 if stats["rssBytes"] is not None else None,
+            "connections": stats["connections"],
+            "broadcastMs": stats["broadcastSeconds"] * 1000.0
+        })
+        previous = stats
+
+
+def client_url(url: str, encoding: str, compression: str) -> str:
+    separator = "&" if "?" in url else "?"
+    return f"{url}{separator}encoding={encoding}&compress={compression}"
+
+
+def raise_open_file_limit(clients: int) -> None:
+    """Each client holds a socket, lift the soft descriptor limit where possible"""
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    wanted = clients + 256
+    if soft < wanted:
+        target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        if target < wanted:
+            logger.warning("Open file limit %d is below the %d clients requested", target, clients)
+
+
+def summarize(clients: List[LoadClient], server_times: Dict[int, float], stopped_at: float, late_ms: float,
+              samples: List[Dict], loop_lag: List[float]) -> Dict:
+    latencies = np.concatenate([np.asarray(c.stats.latencies) for c in clients] or [np.zeros(0)])
+
+    # A version reached some client, every client connected before it should have it too.
+    # Versions younger than the late threshold at stop may still be in flight.
+    settled = sorted(v for v, t in server_times.items() if t <= stopped_at - late_ms / 1000.0)
+    settled_array = np.array(settled, dtype=np.int64)
+    dropped = 0
+    for c in clients:
+        if c.stats.first_version is not None:
+            expected = settled_array[settled_array >= c.stats.first_version]
+            dropped += int(np.count_nonzero(~np.isin(expected, list(c.stats.versions))))
+
+    percentiles = np.percentile(latencies, [50, 99, 99.9]).tolist() if len(latencies) else [None] * 3
+    return {
+        "clients": len(clients),
+        "connected": sum(c.stats.connected for c in clients),
+        "failed": sum(c.stats.failed for c in clients),
+        "updates": int(len(latencies)),
+        "latencyMs": {
+            "p50": percentiles[0],
+            "p99": percentiles[1],
+            "p999": percentiles[2],
+            "max": float(latencies.max()) if len(latencies) else None
+        },
+        "late": sum(c.stats.late for c in clients),
+        "dropped": dropped,
+        "toggles": sum(c.stats.toggles for c in clients),
+        "receivedMB": sum(c.stats.bytes for c in clients) / 2 ** 20,
+        "loopLagMs": {"p99": float(np.percentile(loop_lag, 99)) if loop_lag else None},
+        "server": samples
+    }
+
+
+def print_report(report: Dict) -> None:
+    def ms(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    latency = report["latencyMs"]
+    print(f"Clients     {report['connected']}/{report['clients']} connected, {report['failed']} failed")
+    print(f"Updates     {report['updates']} received, {report['receivedMB']:.1f} MB, {report['toggles']} toggles sent")
+    print(f"Latency ms  p50 {ms(latency['p50'])}  p99 {ms(latency['p99'])}  "
+          f"p999 {ms(latency['p999'])}  max {ms(latency['max'])}")
+    print(f"Frames      {report['late']} late, {report['dropped']} dropped")
+    print(f"Generator   event loop lag p99 {ms(report['loopLagMs']['p99'])} ms "
+          "(high values mean the generator, not the server, is saturated)")
+    print()
+    print(f"{'elapsed s':>10} {'cpu %':>8} {'rss MB':>8} {'conns':>7} {'broadcast ms':>13}")
+    for sample in report["server"]:
+        print(f"{sample['elapsed']:>10.1f} {ms(sample['cpuPercent']):>8} {ms(sample['rssMB']):>8} "
+              f"{sample['connections']:>7} {sample['broadcastMs']:>13.1f}")
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    raise_open_file_limit(args.clients)
+    stop = asyncio.Event()
+    encodings = list(ENCODINGS) if args.encoding == "mixed" else [args.encoding]
+    clients = [LoadClient(
+        client_url(args.url, encodings[i % len(encodings)], args.compress), args.toggle_rate, args.late_ms, stop
+    ) for i in range(args.clients)]
+
+    server_times: Dict[int, float] = {}
+    samples: List[Dict] = []
+    loop_lag: List[float] = []
+    monitor_task = asyncio.create_task(monitor(http_base(args.url), args.sample_interval, stop, samples, loop_lag))
+
+    tasks = []
+    for client in clients:
+        tasks.append(asyncio.create_task(client.run(server_times)))
+        if args.ramp > 0:
+            await asyncio.sleep(args.ramp / len(clients))
+    logger.info("Started %d clients, running for %ss", len(clients), args.duration)
+    await asyncio.sleep(args.duration)
+
+    stopped_at = time.time()
+    stop.set()
+    await asyncio.gather(*tasks, monitor_task, return_exceptions=True)
+    return summarize(clients, server_times, stopped_at, args.late_ms, samples, loop_lag)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="WebSocket load generator for the dashboard server")
+    parser.add_argument("--url", default="ws://localhost:9001/ws", help="WebSocket endpoint")
+    parser.add_argument("--clients", type=int, default=1000, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run once all clients started")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which clients connect")
+    parser.add_argument("--encoding", choices=[*ENCODINGS, "mixed"], default=ENCODING_BINARY)
+    parser.add_argument("--compress", choices=COMPRESSIONS, default=COMPRESSION_NONE)
+    parser.add_argument("--toggle-rate", type=float, default=0.01, help="toggle_strategy messages per client per second")
+    parser.add_argument("--late-ms", type=float, default=500.0, help="Latency above which a frame counts as late")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between server stats samples")
+    parser.add_argument("--output", help="Also write the full report as JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
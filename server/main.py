@@ -1,15 +1,52 @@
 import asyncio
+import multiprocessing
+import os
 import signal
 import sys
-from fastapi import FastAPI, WebSocket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Set
+from typing import Dict, List, Optional, Set
 from contextlib import asynccontextmanager
 import logging
 from simulator import MarketSimulator
-from models import AssetClass
+from models import AssetClass, Trade, WhatIfRequest
+from book import Book, TradeError, revalue
+from limits import LimitEngine
+from hierarchy import Hierarchy, rollup_message
+from risk_model import RiskModel
+from snapshot import SnapshotCache, TickSnapshot, encode_json
+from backtest import run_backtest
+from compression import COMPRESSION_DEFLATE, COMPRESSION_NONE, COMPRESSIONS, FrameCompressor
+from wire import ENCODING_BINARY, ENCODING_JSON, ENCODINGS
+from dotenv import load_dotenv
+from pydantic import ValidationError
+import numpy as np
 import json
 
+load_dotenv()
+
+# Compression settings: application-level deflate for frames above the threshold,
+# protocol-level permessage-deflate (every frame) is off unless explicitly enabled
+WS_COMPRESSION_THRESHOLD = int(os.getenv("WS_COMPRESSION_THRESHOLD", "1024"))
+WS_COMPRESSION_LEVEL = int(os.getenv("WS_COMPRESSION_LEVEL", "6"))
+WS_PERMESSAGE_DEFLATE = os.getenv("WS_PERMESSAGE_DEFLATE", "false").lower() in ("1", "true", "yes")
+
+# Risk limit configuration
+RISK_LIMITS_FILE = os.getenv("RISK_LIMITS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "limits.json"))
+
+# Online EWMA covariance of symbol and FX returns used for parametric risk
+RISK_COVARIANCE_DECAY = float(os.getenv("RISK_COVARIANCE_DECAY", "0.94"))
+RISK_COVARIANCE_SHRINKAGE = float(os.getenv("RISK_COVARIANCE_SHRINKAGE", "0.1"))
+RISK_COVARIANCE_RANK = int(os.getenv("RISK_COVARIANCE_RANK", "0")) or None  # 0 keeps full rank
+
+# Worker processes of the VaR backtest pool, 1 backtests in the request's thread
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+
+# Desk -> portfolio -> strategy hierarchy of the book
+HIERARCHY_FILE = os.getenv("HIERARCHY_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "hierarchy.json"))
+
 # Configure logging to stdout
 logging.basicConfig(
     level=logging.INFO,
@@ -22,10 +59,20 @@ logger = logging.getLogger(__name__)
 
 # Global variables
 active_connections: List[WebSocket] = []
+binary_connections: Dict[WebSocket, int] = {}  # Connection -> last schema version sent
+deflate_connections: Set[WebSocket] = set()
+limit_connections: List[WebSocket] = []
 selected_strategies: Set[int] = set()
 broadcast_task = None
+broadcast_seconds = 0.0  # Time the last tick took to reach every connection
 stop_broadcast = False
 market_simulator = None
+book = None
+limit_engine = None
+hierarchy = None
+backtest_executor = None
+risk_model = RiskModel()
+snapshot_cache = SnapshotCache(FrameCompressor(WS_COMPRESSION_THRESHOLD, WS_COMPRESSION_LEVEL))
 
 # Initial prices
 initial_prices = {
@@ -72,6 +119,7 @@ strategies = [
         "id": 1,
         "name": "Long-Term Growth",
         "selected": False,
+        "reportingCurrency": "USD",
         "positions": [
             {
                 "instrument": {
@@ -128,13 +176,16 @@ strategies = [
             "maxDrawdown": 0.0,
             "exposure": 0.0,
             "riskLimit": 0.0,
-            "volatility": 0.0
+            "volatility": 0.0,
+            "dailyPnL": 0.0,
+            "totalPnL": 0.0
         }
     },
     {
         "id": 2,
         "name": "Value Investing",
         "selected": False,
+        "reportingCurrency": "USD",
         "positions": [
             {
                 "instrument": {
@@ -191,13 +242,16 @@ strategies = [
             "maxDrawdown": 0.0,
             "exposure": 0.0,
             "riskLimit": 0.0,
-            "volatility": 0.0
+            "volatility": 0.0,
+            "dailyPnL": 0.0,
+            "totalPnL": 0.0
         }
     },
     {
         "id": 3,
         "name": "Dividend Focus",
         "selected": False,
+        "reportingCurrency": "USD",
         "positions": [
             {
                 "instrument": {
@@ -254,13 +308,16 @@ strategies = [
             "maxDrawdown": 0.0,
             "exposure": 0.0,
             "riskLimit": 0.0,
-            "volatility": 0.0
+            "volatility": 0.0,
+            "dailyPnL": 0.0,
+            "totalPnL": 0.0
         }
     },
     {
         "id": 4,
         "name": "Sector Rotation",
         "selected": False,
+        "reportingCurrency": "USD",
         "positions": [
             {
                 "instrument": {
@@ -317,13 +374,16 @@ strategies = [
             "maxDrawdown": 0.0,
             "exposure": 0.0,
             "riskLimit": 0.0,
-            "volatility": 0.0
+            "volatility": 0.0,
+            "dailyPnL": 0.0,
+            "totalPnL": 0.0
         }
     },
     {
         "id": 5,
         "name": "Market Neutral",
         "selected": False,
+        "reportingCurrency": "EUR",
         "positions": [
             {
                 "instrument": {
@@ -396,51 +456,121 @@ strategies = [
             "maxDrawdown": 0.0,
             "exposure": 0.0,
             "riskLimit": 0.0,
-            "volatility": 0.0
+            "volatility": 0.0,
+            "dailyPnL": 0.0,
+            "totalPnL": 0.0
         }
     }
 ]
 
+def publish_tick() -> TickSnapshot:
+    """Revalue the book at the current prices and publish an immutable snapshot"""
+    # Per-symbol metrics once for the whole book, then revalue every strategy
+    # from its layout (only strategies touched by trades are rebuilt)
+    symbol_metrics = market_simulator.calculate_symbol_metrics(book.held)
+    layouts = book.layouts()
+    prices = np.array([market_simulator.current_prices[symbol] for symbol in book.symbols])
+    fx = market_simulator.fx_snapshot([layout.currency for layout in layouts])
+    risk_limits = limit_engine.exposure_limits(layouts, len(prices))
+    # Portfolio VaR over the covariance estimate, projected for the version about
+    # to be published so what-if requests on it reuse the projection
+    estimate = market_simulator.risk_covariance
+    risk_model.update(estimate.version, estimate.factor, snapshot_cache.version + 1, layouts, prices, fx,
+                      estimate.specific)
+    metrics = revalue(layouts, prices, symbol_metrics, risk_limits, fx, risk_model.volatility)
+    return snapshot_cache.publish(book.symbols, prices, layouts, book.selection(layouts), metrics, symbol_metrics, fx)
+
+async def send_snapshot_text(connection: WebSocket, snapshot: TickSnapshot, name: str) -> None:
+    """Send an encoded text message, deflated if the client asked and it is large enough"""
+    if connection in deflate_connections:
+        frame = snapshot_cache.deflated(snapshot, name)
+        if frame is not None:
+            await connection.send_bytes(frame)
+            return
+    await connection.send_text(getattr(snapshot, name))
+
+async def send_schema(connection: WebSocket, snapshot: TickSnapshot) -> None:
+    """Send the binary frame layout and remember which version the client has"""
+    await connection.send_text(snapshot.schema_text)
+    binary_connections[connection] = snapshot.schema.version
+
+async def send_update(connection: WebSocket, snapshot: TickSnapshot) -> None:
+    """Send a snapshot update in the encoding the connection negotiated"""
+    if connection in binary_connections:
+        if binary_connections[connection] != snapshot.schema.version:
+            # Layout changed, resend the full state so the client learns the new positions
+            await send_snapshot_text(connection, snapshot, "update_text")
+            await send_schema(connection, snapshot)
+        else:
+            await connection.send_bytes(snapshot.update_binary)
+    else:
+        await send_snapshot_text(connection, snapshot, "update_text")
+
+async def broadcast_limit_events(snapshot: TickSnapshot) -> None:
+    """Evaluate risk limits on a snapshot and push state changes to the limits channel"""
+    events = limit_engine.evaluate(snapshot.version, snapshot.layouts, snapshot.prices, snapshot.metrics, snapshot.fx)
+    if not events:
+        return
+    for event in events:
+        log = logger.warning if event["event"] == "breach" else logger.info
+        log("Risk limit %s %s: %.4g / %.4g", event["limitId"], event["event"], event["value"], event["limit"])
+    message = encode_json({"type": "limit_events", "data": {"events": events}})
+    for connection in list(limit_connections):
+        try:
+            await connection.send_text(message)
+        except Exception as e:
+            logger.error("Error sending limit events: %s", e)
+            limit_connections.remove(connection)
+
+async def send_rollup(connections: List[WebSocket], message: str, deflated: Optional[bytes] = None) -> None:
+    """Send an encoded rollup message, as the deflated frame to the connections that asked"""
+    for connection in connections:
+        try:
+            if deflated is not None and connection in deflate_connections:
+                await connection.send_bytes(deflated)
+            else:
+                await connection.send_text(message)
+        except Exception as e:
+            logger.error("Error sending rollup: %s", e)
+
+async def broadcast_rollup(snapshot: TickSnapshot) -> None:
+    """Aggregate the hierarchy on a snapshot and push the nodes that changed"""
+    nodes = hierarchy.update(snapshot.version, snapshot.layouts, snapshot.prices, snapshot.metrics, snapshot.fx)
+    if nodes:
+        connections = list(active_connections)
+        # Encoded once, and deflated once if any connection asked
+        message = rollup_message(hierarchy.version, nodes)
+        deflated = None
+        if any(connection in deflate_connections for connection in connections):
+            deflated = snapshot_cache.compressor.compress(message)
+        await send_rollup(connections, message, deflated)
+
 async def broadcast_updates():
-    global stop_broadcast
+    global stop_broadcast, broadcast_seconds
     while not stop_broadcast:
         try:
             # Update prices
-            new_prices = market_simulator.update_prices()
-            
-            # Update positions and metrics
-            for strategy in strategies:
-                # Update position P&L
-                for position in strategy["positions"]:
-                    symbol = position["instrument"]["internalCode"]
-                    position["lastPrice"] = new_prices[symbol]
-                
-                # Update strategy metrics
-                metrics = market_simulator.calculate_position_metrics(strategy["positions"])
-                strategy["riskMetrics"] = {
-                    "var95": metrics["var95"],
-                    "var99": metrics["var99"],
-                    "maxDrawdown": metrics["max_drawdown"],
-                    "exposure": metrics["exposure"],
-                    "volatility": metrics["volatility"],
-                    "riskLimit": metrics["risk_limit"]
-                }
-
-            # Prepare update message
-            message = {
-                "type": "update",
-                "data": {
-                    "strategies": strategies
-                }
-            }
+            market_simulator.update_prices()
+
+            # Serialize once per tick, every connection gets the same immutable snapshot
+            snapshot = publish_tick()
 
             # Send to all active connections
-            for connection in active_connections:
+            started = time.perf_counter()
+            for connection in list(active_connections):
                 try:
-                    await connection.send_json(message)
+                    await send_update(connection, snapshot)
                 except Exception as e:
-                    logger.error(f"Error sending to connection: {e}")
-                    active_connections.remove(connection)
+                    logger.error("Error sending to connection: %s", e)
+                    # The endpoint may already have dropped it while we were awaiting
+                    if connection in active_connections:
+                        active_connections.remove(connection)
+                    binary_connections.pop(connection, None)
+                    deflate_connections.discard(connection)
+            broadcast_seconds = time.perf_counter() - started
+
+            await broadcast_rollup(snapshot)
+            await broadcast_limit_events(snapshot)
 
             await asyncio.sleep(1)  # Update every second
         except Exception as e:
@@ -450,7 +580,7 @@ async def broadcast_updates():
             await asyncio.sleep(1)  # Wait before retrying
 
 async def cleanup():
-    global stop_broadcast, broadcast_task
+    global stop_broadcast, broadcast_task, backtest_executor
     logger.info("Cleaning up resources...")
     stop_broadcast = True
     
@@ -468,8 +598,21 @@ async def cleanup():
         except Exception as e:
             logger.error(f"Error closing connection: {e}")
     
+    for connection in limit_connections:
+        try:
+            await connection.close()
+        except Exception as e:
+            logger.error(f"Error closing connection: {e}")
+
     active_connections.clear()
+    limit_connections.clear()
+    binary_connections.clear()
+    deflate_connections.clear()
     selected_strategies.clear()
+
+    if backtest_executor is not None:
+        backtest_executor.shutdown(cancel_futures=True)
+        backtest_executor = None
     logger.info("Cleanup completed")
 
 def handle_shutdown(signum, frame):
@@ -480,16 +623,35 @@ def handle_shutdown(signum, frame):
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global broadcast_task, market_simulator
-    # Initialize market simulator
-    market_simulator = MarketSimulator({}, initial_prices)
+    global broadcast_task, market_simulator, book, limit_engine, hierarchy, backtest_executor
+    # Initialize market simulator and the book of positions
+    instruments = {
+        position["instrument"]["internalCode"]: position["instrument"]
+        for strategy in strategies
+        for position in strategy["positions"]
+    }
+    market_simulator = MarketSimulator(
+        instruments, initial_prices, covariance_decay=RISK_COVARIANCE_DECAY,
+        covariance_shrinkage=RISK_COVARIANCE_SHRINKAGE, covariance_rank=RISK_COVARIANCE_RANK
+    )
+    book = Book(strategies, instruments, market_simulator.symbols, market_simulator.opening_fx)
+    hierarchy = Hierarchy.from_file(HIERARCHY_FILE)
+    limit_engine = LimitEngine.from_file(RISK_LIMITS_FILE, hierarchy.desk_strategies)
+    snapshot = publish_tick()
+    hierarchy.update(snapshot.version, snapshot.layouts, snapshot.prices, snapshot.metrics, snapshot.fx)
+
+    # One pool for the life of the server. Workers are spawned, not forked from
+    # this multithreaded process, and only pay their startup once.
+    if BACKTEST_WORKERS > 1:
+        backtest_executor = ProcessPoolExecutor(BACKTEST_WORKERS, mp_context=multiprocessing.get_context("spawn"))
     
     # Start broadcast task
     broadcast_task = asyncio.create_task(broadcast_updates())
     
     # Setup signal handlers
     signal.signal(signal.SIGINT, handle_shutdown)
-    signal.signal(signal.SIGBREAK, handle_shutdown)
+    if hasattr(signal, "SIGBREAK"):  # Windows only
+        signal.signal(signal.SIGBREAK, handle_shutdown)
     
     yield
     
@@ -507,38 +669,194 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/stats/compression")
+async def compression_stats():
+    """Compression ratio and CPU cost since startup"""
+    return {
+        "threshold": WS_COMPRESSION_THRESHOLD,
+        "level": WS_COMPRESSION_LEVEL,
+        "perMessageDeflate": WS_PERMESSAGE_DEFLATE,
+        **snapshot_cache.compressor.stats.as_dict()
+    }
+
+def resident_memory() -> Optional[int]:
+    """Resident set size of the server in bytes, where the platform exposes it"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+@app.get("/stats/process")
+async def process_stats():
+    """CPU time, memory and connection counts, sampled by the load generator"""
+    return {
+        "time": time.time(),
+        "cpuSeconds": time.process_time(),
+        "rssBytes": resident_memory(),
+        "connections": len(active_connections),
+        "binaryConnections": len(binary_connections),
+        "deflateConnections": len(deflate_connections),
+        "version": snapshot_cache.version,
+        "broadcastSeconds": broadcast_seconds
+    }
+
+@app.get("/limits")
+async def get_limits():
+    """Current value, utilization and state of every risk limit"""
+    return {"hysteresis": limit_engine.hysteresis, "limits": limit_engine.status()}
+
+@app.get("/hierarchy")
+async def get_hierarchy():
+    """Exposure, P&L and risk rolled up to every node of the book hierarchy"""
+    return {"version": hierarchy.version, "nodes": hierarchy.status()}
+
+@app.get("/snapshot")
+async def get_snapshot():
+    """Latest published state of the book"""
+    snapshot = snapshot_cache.current
+    return {
+        "version": snapshot.version,
+        "prices": snapshot.price_map,
+        "fxRates": snapshot.fx_map,
+        "strategies": snapshot.strategies()
+    }
+
+def book_trade(trade: Trade):
+    """Book a trade, the affected strategy is revalued on the next tick"""
+    position = book.book_trade(trade, market_simulator.current_prices, market_simulator.opening_prices,
+                               market_simulator.current_fx, market_simulator.opening_fx)
+    if position is not None:
+        position = {**position, "lastPrice": market_simulator.current_prices[trade.symbol]}
+    return {"strategyId": trade.strategyId, "symbol": trade.symbol, "position": position}
+
+@app.post("/trades")
+async def post_trade(trade: Trade):
+    """Add to, amend or close a position"""
+    try:
+        return book_trade(trade)
+    except TradeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/whatif")
+async def what_if(request: WhatIfRequest):
+    """Pre-trade risk of hypothetical trades, nothing is booked"""
+    snapshot = snapshot_cache.current
+    estimate = market_simulator.risk_covariance
+    risk_model.update(estimate.version, estimate.factor,
+                      snapshot.version, snapshot.layouts, snapshot.prices, snapshot.fx, estimate.specific)
+    try:
+        scenarios = risk_model.what_if(request.trades, snapshot.symbols, snapshot.prices,
+                                       request.confidence, request.combined)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"version": snapshot.version, "confidence": request.confidence, "scenarios": scenarios}
+
+@app.get("/indicators")
+async def indicators():
+    """Current rolling indicators for every symbol"""
+    state = market_simulator.indicators
+    correlation = state.correlation
+    return {
+        symbol: {
+            "momentum": float(state.momentum[i]),
+            "ewmaVolatility": float(state.ewma_volatility[i]),
+            "drawdown": float(state.drawdown[i]),
+            "maxDrawdown": float(state.max_drawdown[i]),
+            "beta": float(state.beta[i]),
+            "correlations": dict(zip(state.symbols, correlation[i].tolist()))
+        }
+        for i, symbol in enumerate(state.symbols)
+    }
+
+@app.get("/covariance")
+async def covariance():
+    """Current EWMA estimate of the per-tick covariance of symbol and FX returns"""
+    estimate = market_simulator.risk_covariance
+    return {
+        "version": estimate.version,
+        "observations": estimate.count,
+        "decay": estimate.decay,
+        "shrinkage": estimate.shrinkage,
+        "rank": estimate.rank,
+        "factors": market_simulator.risk_factors,
+        "volatility": estimate.volatility.tolist(),
+        "correlation": estimate.correlation.tolist(),
+        "covariance": estimate.covariance.tolist()
+    }
+
+@app.get("/backtest")
+async def backtest(window: int = 250):
+    """Backtest rolling historical VaR/ES of every strategy over the stored history"""
+    symbols, prices = market_simulator.price_matrix()
+    loop = asyncio.get_running_loop()
+    try:
+        book_strategies = snapshot_cache.current.strategies()
+        return await loop.run_in_executor(
+            None, lambda: run_backtest(book_strategies, symbols, prices, window, executor=backtest_executor)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    encoding = websocket.query_params.get("encoding", ENCODING_JSON)
+    if encoding not in ENCODINGS:
+        logger.warning("Unknown encoding %r requested, falling back to %s", encoding, ENCODING_JSON)
+        encoding = ENCODING_JSON
+    compression = websocket.query_params.get("compress", COMPRESSION_NONE)
+    if compression not in COMPRESSIONS:
+        logger.warning("Unknown compression %r requested, falling back to %s", compression, COMPRESSION_NONE)
+        compression = COMPRESSION_NONE
+    if compression == COMPRESSION_DEFLATE:
+        deflate_connections.add(websocket)
     active_connections.append(websocket)
-    logger.info(f"New WebSocket connection established. Total connections: {len(active_connections)}")
+    logger.info("New WebSocket connection established (%s, %s). Total connections: %d",
+                encoding, compression, len(active_connections))
     
     try:
-        # Send initial data
-        initial_message = {
-            "type": "initial",
-            "data": {
-                "prices": market_simulator.current_prices,
-                "strategies": strategies
-            }
-        }
-        logger.debug(f"Sending initial data: {json.dumps(initial_message, indent=2)}")
-        await websocket.send_json(initial_message)
+        # Send the pre-encoded snapshot, no serialization on connect
+        snapshot = snapshot_cache.current
+        logger.debug("Sending initial snapshot v%d", snapshot.version)
+        await send_snapshot_text(websocket, snapshot, "initial_text")
+        if encoding == ENCODING_BINARY:
+            # Full instrument details come with the initial message, updates are compact frames
+            await send_schema(websocket, snapshot)
+        # Full tree, encoded (and deflated) once per tick however many clients connect
+        compressor = snapshot_cache.compressor if websocket in deflate_connections else None
+        await send_rollup([websocket], *hierarchy.status_message(compressor))
         
         # Handle messages from client
         while True:
             try:
                 data = await websocket.receive_json()
-                logger.debug(f"Received message from client: {json.dumps(data, indent=2)}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Received message from client: %s", json.dumps(data, indent=2))
                 
                 if data["type"] == "toggle_strategy":
-                    strategy_id = data["strategyId"]
-                    for strategy in strategies:
-                        if strategy["id"] == strategy_id:
-                            strategy["selected"] = not strategy["selected"]
-                            logger.info(f"Toggled strategy {strategy['name']} to {strategy['selected']}")
-                            break
+                    try:
+                        strategy = book.toggle(data["strategyId"])
+                    except TradeError as e:
+                        logger.warning("Cannot toggle strategy: %s", e)
+                    else:
+                        # Published with the next tick, like trades, so toggles never re-encode the book
+                        logger.info("Toggled strategy %s to %s", strategy["name"], strategy["selected"])
+
+                elif data["type"] == "book_trade":
+                    try:
+                        result = book_trade(Trade(**data["trade"]))
+                        await websocket.send_json({"type": "trade_booked", "data": result})
+                    except (TradeError, ValidationError) as e:
+                        await websocket.send_json({"type": "trade_rejected", "data": {"error": str(e)}})
                 
+            except WebSocketDisconnect:
+                break
             except Exception as e:
                 logger.error(f"Error handling client message: {e}", exc_info=True)
                 break
@@ -546,9 +864,35 @@ async def websocket_endpoint(websocket: WebSocket):
     except Exception as e:
         logger.error(f"WebSocket error: {e}", exc_info=True)
     finally:
-        active_connections.remove(websocket)
-        logger.info(f"WebSocket connection closed. Remaining connections: {len(active_connections)}")
+        if websocket in active_connections:
+            active_connections.remove(websocket)
+        binary_connections.pop(websocket, None)
+        deflate_connections.discard(websocket)
+        logger.info("WebSocket connection closed. Remaining connections: %d", len(active_connections))
+
+@app.websocket("/ws/limits")
+async def limits_endpoint(websocket: WebSocket):
+    """Dedicated channel for risk limit breach/clear events"""
+    await websocket.accept()
+    limit_connections.append(websocket)
+    logger.info("New limits connection established. Total limit connections: %d", len(limit_connections))
+    try:
+        await websocket.send_json({
+            "type": "limit_status",
+            "data": {"version": snapshot_cache.version, "limits": limit_engine.status()}
+        })
+        # Nothing to receive, keep the channel open until the client goes away
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Limits WebSocket error: {e}", exc_info=True)
+    finally:
+        if websocket in limit_connections:
+            limit_connections.remove(websocket)
+        logger.info("Limits connection closed. Remaining limit connections: %d", len(limit_connections))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=9001) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=9001, ws_per_message_deflate=WS_PERMESSAGE_DEFLATE) 
\ No newline at end of file
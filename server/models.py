@@ -1,6 +1,8 @@
-from typing import List, TypedDict, Dict
+from typing import List, TypedDict, Dict, Optional, Tuple
 from enum import Enum
 from dataclasses import dataclass
+from pydantic import BaseModel, Field
+import numpy as np
 
 class FinancialInstrument(TypedDict):
     internalCode: str
@@ -18,6 +20,8 @@ class Position(TypedDict):
     lastPrice: float  # Added to track last price for P&L calculation
     openingPrice: float  # Price at the start of the trading day
     entryPrice: float    # Average price paid to enter the position
+    openingFx: float     # Quote to reporting currency rate at the start of the trading day
+    entryFx: float       # Quote to reporting currency rate the position was entered at
 
 class RiskMetrics(TypedDict):
     var95: float
@@ -26,6 +30,14 @@ class RiskMetrics(TypedDict):
     exposure: float
     riskLimit: float
     volatility: float  # Added volatility metric
+    dailyPnL: float    # Against the opening price, in the reporting currency
+    totalPnL: float    # Against the entry price, in the reporting currency
+
+# Column order of risk metrics in array-backed snapshots
+RISK_METRIC_FIELDS = tuple(RiskMetrics.__annotations__)
+
+# Currency FX rates are quoted against (units of base currency per unit)
+BASE_CURRENCY = "USD"
 
 class Strategy(TypedDict):
     id: int
@@ -33,6 +45,44 @@ class Strategy(TypedDict):
     selected: bool
     positions: List[Position]
     riskMetrics: RiskMetrics
+    reportingCurrency: str  # Currency exposure, P&L and risk are reported in
+
+@dataclass(frozen=True)
+class StrategyLayout:
+    """Positions of a strategy frozen at a point in time, with column arrays for revaluation"""
+    id: int
+    name: str
+    positions: Tuple[Position, ...]  # Copies of the position definitions, never mutated
+    indices: np.ndarray              # Symbol index of each position (read-only)
+    quantities: np.ndarray           # Quantity of each position (read-only)
+    opening_prices: np.ndarray       # Opening price of each position (read-only)
+    entry_prices: np.ndarray         # Entry price of each position (read-only)
+    opening_fx: np.ndarray           # Opening quote to reporting rate of each position (read-only)
+    entry_fx: np.ndarray             # Entry quote to reporting rate of each position (read-only)
+    currency: str = BASE_CURRENCY    # Reporting currency
+
+    @property
+    def codes(self) -> Tuple[str, ...]:
+        return tuple(p["instrument"]["internalCode"] for p in self.positions)
+
+class TradeAction(str, Enum):
+    ADD = "add"      # Buy (positive quantity) or sell (negative quantity)
+    AMEND = "amend"  # Correct the quantity and/or entry price of a position
+    CLOSE = "close"  # Remove the position
+
+class Trade(BaseModel):
+    strategyId: int
+    symbol: str                      # Instrument internal code
+    action: TradeAction = TradeAction.ADD
+    # Signed fill for add, new quantity for amend (None keeps it)
+    quantity: Optional[float] = Field(None, allow_inf_nan=False)
+    # Fill price (entry price for amend), defaults to the last price
+    price: Optional[float] = Field(None, allow_inf_nan=False)
+
+class WhatIfRequest(BaseModel):
+    trades: List[Trade]
+    confidence: float = Field(0.99, gt=0.0, lt=1.0)
+    combined: bool = True            # One scenario per strategy, or one per trade
 
 class AssetClass(Enum):
     TECH = "Technology"
@@ -50,4 +100,19 @@ class AssetParams:
     jump_probability: float # Probability of price jumps
     jump_scale: float      # Scale of price jumps
     beta: float           # Market beta
-    asset_class: AssetClass  # Asset class for specialized modeling 
\ No newline at end of file
+    asset_class: AssetClass  # Asset class for specialized modeling
+
+@dataclass
+class FxParams:
+    initial_rate: float     # Units of base currency per unit of this currency
+    volatility: float       # Daily volatility of the rate
+
+@dataclass(frozen=True)
+class FxRates:
+    """FX rates of one tick, gathered into per-symbol and per-strategy arrays"""
+    currencies: Tuple[str, ...]      # Base currency first
+    rates: np.ndarray                # Base currency per unit, one per currency
+    symbol_currency: np.ndarray      # Currency index of each symbol's quote currency
+    reporting_currency: np.ndarray   # Currency index of each strategy's reporting currency
+    symbol_fx: np.ndarray            # Rate of each symbol's quote currency
+    reporting_fx: np.ndarray         # Rate of each strategy's reporting currency 
\ No newline at end of file
@@ -0,0 +1,177 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+import numpy as np
+from scipy.stats import norm
+from models import FxRates, StrategyLayout, Trade, TradeAction
+
+logger = logging.getLogger(__name__)
+
+
+class RiskModel:
+    """Parametric (variance-covariance) risk of strategies and what-if trades.
+
+    Works in factor exposures e against the per-tick return covariance of
+    the symbols followed by the non-base currencies, given by its factor
+    model (covariance = F F^T + diag(s)). A position worth x in its
+    strategy's reporting currency loads x on its symbol, +x on its quote
+    currency and -x on the reporting currency, the base currency having no
+    factor. For every strategy Y = e F is cached per (snapshot, covariance)
+    version, so a what-if only projects the trade deltas through F:
+    volatility = sqrt(|Y|^2 + sum(e^2 s)), covariance @ e = Y F^T + e s.
+    With truncated loadings F is narrow and the specific part is a vector,
+    so the cost scales with the rank rather than the number of factors.
+    """
+
+    def __init__(self):
+        self._factor: Optional[np.ndarray] = None
+        self._specific: Optional[np.ndarray] = None
+        self._covariance_version = None
+        self._snapshot_version = None
+        self._fx: Optional[FxRates] = None
+        self._quantities: Optional[np.ndarray] = None  # Strategies x symbols
+        self._exposures: Optional[np.ndarray] = None   # Strategies x symbols, reporting currency
+        self._projected: Optional[np.ndarray] = None   # Strategies x factors
+        self.volatility = np.zeros(0)                  # P&L volatility per strategy, reporting currency
+        self._strategy_ids: List[int] = []
+        self._strategy_row: Dict[int, int] = {}
+
+    def update(self, covariance_version: int, factor: np.ndarray, snapshot_version: int,
+               layouts: Sequence[StrategyLayout], prices: np.ndarray, fx: FxRates,
+               specific: Optional[np.ndarray] = None) -> None:
+        """Refresh cached state when the covariance or the snapshot changed"""
+        if covariance_version == self._covariance_version and snapshot_version == self._snapshot_version:
+            return
+        quantities = np.zeros((len(layouts), len(prices)))
+        for j, layout in enumerate(layouts):
+            np.add.at(quantities[j], layout.indices, layout.quantities)
+        self._fx = fx
+        self._factor = factor
+        self._specific = specific if specific is not None else np.zeros(len(factor))
+        self._quantities = quantities
+        self._exposures = quantities * self._conversion(prices, np.arange(len(layouts)))
+        factor_exposures = self._factor_exposures(self._exposures, fx.reporting_currency)
+        self._projected = factor_exposures @ factor
+        self.volatility = self._volatility(self._projected, factor_exposures)
+        self._strategy_ids = [layout.id for layout in layouts]
+        self._strategy_row = {strategy_id: j for j, strategy_id in enumerate(self._strategy_ids)}
+        self._covariance_version = covariance_version
+        self._snapshot_version = snapshot_version
+
+    def _conversion(self, prices: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Value of one unit of each symbol in the reporting currency of each strategy row"""
+        return (prices * self._fx.symbol_fx)[None, :] / self._fx.reporting_fx[rows, None]
+
+    def _volatility(self, projected: np.ndarray, factor_exposures: np.ndarray) -> np.ndarray:
+        """P&L volatility of each row from its projection Y = e F and its factor exposures e"""
+        return np.sqrt(np.einsum("ij,ij->i", projected, projected) + factor_exposures ** 2 @ self._specific)
+
+    def _factor_exposures(self, exposures: np.ndarray, reporting: np.ndarray) -> np.ndarray:
+        """Factor exposures of (rows x symbols) exposures held in the given reporting currencies"""
+        currencies = np.zeros((len(exposures), len(self._fx.currencies)))
+        np.add.at(currencies.T, self._fx.symbol_currency, exposures.T)
+        currencies[np.arange(len(exposures)), reporting] -= exposures.sum(axis=1)
+        return np.hstack((exposures, currencies[:, 1:]))
+
+    def what_if(self, trades: List[Trade], symbols: Sequence[str], prices: np.ndarray,
+                confidence: float = 0.99, combined: bool = True) -> List[Dict]:
+        """Risk before and after hypothetical trades.
+
+        With combined=True the trades are applied together, one scenario per
+        affected strategy; otherwise every trade is its own scenario. All
+        scenarios are evaluated in one batch.
+        """
+        symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        scenarios: List[Tuple[int, List[int]]] = []   # (strategy row, trade numbers)
+        by_strategy: Dict[int, int] = {}
+        changes = []
+        for number, trade in enumerate(trades):
+            if trade.strategyId not in self._strategy_row:
+                raise ValueError(f"Unknown strategy {trade.strategyId}")
+            if trade.symbol not in symbol_index:
+                raise ValueError(f"Unknown instrument {trade.symbol}")
+            if trade.action == TradeAction.ADD and not trade.quantity:
+                raise ValueError("Trade quantity is required and cannot be zero")
+            row, column = self._strategy_row[trade.strategyId], symbol_index[trade.symbol]
+
+            if combined and row in by_strategy:
+                scenario = by_strategy[row]
+                scenarios[scenario][1].append(number)
+            else:
+                scenario = len(scenarios)
+                by_strategy[row] = scenario
+                scenarios.append((row, [number]))
+                changes.append(np.zeros(len(symbols)))
+
+            # Quantity change implied by the trade, on top of earlier trades of the scenario
+            held = self._quantities[row, column] + changes[scenario][column]
+            if trade.action == TradeAction.ADD:
+                changes[scenario][column] += trade.quantity
+            elif trade.action == TradeAction.AMEND:
+                # A price-only amend corrects the entry price, the exposure stays
+                if trade.quantity is not None:
+                    changes[scenario][column] += trade.quantity - held
+            else:
+                changes[scenario][column] -= held
+
+        if not scenarios:
+            return []
+        rows = np.array([row for row, _ in scenarios], dtype=np.intp)
+        reporting = self._fx.reporting_currency[rows]
+        delta = np.vstack(changes) * self._conversion(prices, rows)
+
+        before = self._exposures[rows]
+        after = before + delta
+        factor_after = self._factor_exposures(after, reporting)
+        projected_after = self._projected[rows] + self._factor_exposures(delta, reporting) @ self._factor
+
+        z = norm.ppf(confidence)
+        volatility_before = self.volatility[rows]
+        volatility_after = self._volatility(projected_after, factor_after)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gradient = np.where(
+                volatility_after[:, None] > 0,
+                z * (projected_after @ self._factor.T + factor_after * self._specific) / volatility_after[:, None],
+                0.0
+            )
+        # A position's exposure moves its symbol, quote currency and reporting currency factors
+        n_symbols = len(symbols)
+        currency_gradient = np.hstack((np.zeros((len(rows), 1)), gradient[:, n_symbols:]))
+        marginal = (
+            gradient[:, :n_symbols]
+            + currency_gradient[:, self._fx.symbol_currency]
+            - currency_gradient[np.arange(len(rows)), reporting][:, None]
+        )
+        component = after * marginal
+
+        results = []
+        for k, (row, numbers) in enumerate(scenarios):
+            before_stats = self._stats(before[k], volatility_before[k], z)
+            after_stats = self._stats(after[k], volatility_after[k], z)
+            held = np.flatnonzero(after[k])
+            results.append({
+                "strategyId": self._strategy_ids[row],
+                "currency": self._fx.currencies[reporting[k]],
+                "trades": numbers,
+                "before": before_stats,
+                "after": after_stats,
+                "change": {key: after_stats[key] - before_stats[key] for key in before_stats},
+                "positions": [
+                    {
+                        "symbol": symbols[i],
+                        "exposure": float(after[k, i]),
+                        "marginalVar": float(marginal[k, i]),
+                        "componentVar": float(component[k, i])
+                    }
+                    for i in held
+                ]
+            })
+        return results
+
+    @staticmethod
+    def _stats(exposures: np.ndarray, volatility: float, z: float) -> Dict[str, float]:
+        return {
+            "exposure": float(np.abs(exposures).sum()),
+            "netExposure": float(exposures.sum()),
+            "volatility": float(volatility),
+            "var": float(z * volatility)
+        }
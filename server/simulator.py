@@ -1,21 +1,32 @@
 import asyncio
-from typing import Dict, List
-from models import Strategy, RiskMetrics, AssetClass, AssetParams, Position
+from typing import Dict, List, Optional, Sequence, Tuple
+from models import Strategy, RiskMetrics, AssetClass, AssetParams, Position, BASE_CURRENCY, FxParams, FxRates
 import logging
 import numpy as np
 import math
 from datetime import datetime
-from scipy.stats import multivariate_normal
+from indicators import EwmaCovariance, RollingIndicators, max_drawdown
 
 logger = logging.getLogger(__name__)
 
+# Simulated time per tick in years, one trading day
+TICK_DT = 1.0 / 252
+
 class MarketSimulator:
-    def __init__(self, instruments: Dict[str, Dict], initial_prices: Dict[str, float]):
+    def __init__(self, instruments: Dict[str, Dict], initial_prices: Dict[str, float],
+                 covariance_decay: float = 0.94, covariance_shrinkage: float = 0.0, covariance_rank: Optional[int] = None):
         self.instruments = instruments
         self.current_prices = initial_prices.copy()
         self.opening_prices = initial_prices.copy()  # Store opening prices for client-side P&L
         self.price_history: Dict[str, List[float]] = {symbol: [price] for symbol, price in initial_prices.items()}
         self.current_returns: Dict[str, float] = {symbol: 0.0 for symbol in initial_prices.keys()}
+        self.market_return = 0.0
+        self.symbols = list(initial_prices.keys())
+        self.symbol_index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # Momentum over the last 20 prices, i.e. 19 returns
+        self.indicators = RollingIndicators(
+            self.symbols, np.array([initial_prices[s] for s in self.symbols]), momentum_lookback=19
+        )
         self.last_update = datetime.now()
         
         # Define asset parameters based on asset class
@@ -76,30 +87,79 @@ class MarketSimulator:
             [0.4, 0.5, 0.6, 0.2, 1.0]   # AMZN
         ])
 
+        # FX rates against the base currency, simulated in the same draw as the equities
+        self.fx_params = {
+            "EUR": FxParams(initial_rate=1.08, volatility=0.006),
+            "GBP": FxParams(initial_rate=1.27, volatility=0.0065),
+            "JPY": FxParams(initial_rate=0.0067, volatility=0.007)
+        }
+        self.fx_correlation_matrix = np.array([
+            [1.0, 0.6, 0.3],    # EUR
+            [0.6, 1.0, 0.25],   # GBP
+            [0.3, 0.25, 1.0]    # JPY
+        ])
+        # Correlation of each equity (rows) with each currency (columns)
+        self.equity_fx_correlation = np.tile([0.1, 0.1, -0.15], (len(self.symbols), 1))
+
+        self.currencies = [BASE_CURRENCY, *self.fx_params]
+        self.currency_index = {currency: i for i, currency in enumerate(self.currencies)}
+        self.fx_rates = np.array([1.0, *(params.initial_rate for params in self.fx_params.values())])
+        self.opening_fx_rates = self.fx_rates.copy()
+        self.fx_returns = np.zeros(len(self.fx_params))
+        unknown = {instrument["currency"] for instrument in instruments.values()} - set(self.currencies)
+        if unknown:
+            raise ValueError(f"No FX rate for currencies {sorted(unknown)}")
+        self.symbol_currency = np.array(
+            [self.currency_index[instruments[symbol]["currency"]] for symbol in self.symbols], dtype=np.intp
+        )
+        # Risk factors of the covariance: symbol returns, then non-base currency returns
+        self.risk_factors = [*self.symbols, *self.fx_params]
+
         # Market parameters
         self.market_volatility = 0.015
         self.risk_free_rate = 0.00005  # Daily risk-free rate
+
+        # Daily covariance and its Cholesky factor, cached until the parameters change
+        self.covariance_version = 0
+        self.refresh_covariance()
+
+        # Covariance of per-tick returns estimated from the generated ones, for risk
+        # consumers. Starts from the model covariance scaled to one tick, the same
+        # scale as the realized returns it is updated with.
+        self.risk_covariance = EwmaCovariance(
+            len(self.risk_factors), decay=covariance_decay, shrinkage=covariance_shrinkage,
+            rank=covariance_rank, initial=self.covariance * TICK_DT
+        )
         
         logger.info("Market simulator initialized with base prices")
 
-    def simulate_returns(self, dt: float = 1.0/252) -> Dict[str, float]:
+    def refresh_covariance(self) -> None:
+        """Rebuild the model covariance of all risk factors, used to generate returns"""
+        volatilities = np.array([
+            *(params.base_volatility for params in self.asset_params.values()),
+            *(params.volatility for params in self.fx_params.values())
+        ])
+        correlation = np.block([
+            [self.correlation_matrix, self.equity_fx_correlation],
+            [self.equity_fx_correlation.T, self.fx_correlation_matrix]
+        ])
+        self.covariance = correlation * np.outer(volatilities, volatilities)
+        self.covariance_factor = np.linalg.cholesky(self.covariance)
+        self.covariance_version += 1
+
+    def simulate_returns(self, dt: float = TICK_DT) -> Dict[str, float]:
         """Simulate correlated returns for all assets"""
         n_assets = len(self.asset_params)
         
-        # Generate correlated normal random variables
-        cov_matrix = self.correlation_matrix * np.outer(
-            [params.base_volatility for params in self.asset_params.values()],
-            [params.base_volatility for params in self.asset_params.values()]
-        )
-        
         # Generate market return
         market_return = np.random.normal(0, self.market_volatility * np.sqrt(dt))
+        self.market_return = market_return
         
-        # Generate idiosyncratic returns
-        idiosyncratic_returns = multivariate_normal.rvs(
-            mean=np.zeros(n_assets),
-            cov=cov_matrix * dt
-        )
+        # Generate idiosyncratic and FX returns
+        # Correlated draws through the cached Cholesky factor
+        draws = self.covariance_factor @ np.random.standard_normal(len(self.risk_factors)) * np.sqrt(dt)
+        idiosyncratic_returns = draws[:n_assets]
+        self.fx_returns = draws[n_assets:]
         
         # Combine market and idiosyncratic returns
         returns = {}
@@ -169,13 +229,9 @@ class MarketSimulator:
         
         return seasonality + shock
 
-    def _calculate_momentum(self, symbol: str, lookback: int = 20) -> float:
-        """Calculate price momentum"""
-        prices = self.price_history[symbol][-lookback:]
-        if len(prices) < 2:
-            return 0
-        returns = np.diff(np.log(prices))
-        return np.mean(returns)
+    def _calculate_momentum(self, symbol: str) -> float:
+        """Price momentum, maintained incrementally for all symbols each tick"""
+        return self.indicators.momentum[self.symbol_index[symbol]]
 
     def _calculate_seasonality(self) -> float:
         """Calculate seasonal component"""
@@ -207,20 +263,42 @@ class MarketSimulator:
                 self.price_history[symbol] = self.price_history[symbol][-1000:]
         
         self.current_prices = new_prices
+        self.fx_rates = self.fx_rates * np.exp(np.concatenate(([0.0], self.fx_returns)))
+        prices = np.array([new_prices[s] for s in self.symbols])
+        self.risk_covariance.update(np.concatenate((np.log(prices / self.indicators.last_prices), self.fx_returns)))
+        self.indicators.update(prices, self.market_return)
         return new_prices
 
-    def calculate_returns(self, symbol: str) -> List[float]:
+    @property
+    def current_fx(self) -> Dict[str, float]:
+        return dict(zip(self.currencies, self.fx_rates.tolist()))
+
+    @property
+    def opening_fx(self) -> Dict[str, float]:
+        return dict(zip(self.currencies, self.opening_fx_rates.tolist()))
+
+    def fx_snapshot(self, reporting_currencies: Sequence[str]) -> FxRates:
+        """Current rates gathered per symbol and per reporting currency, for array conversions"""
+        reporting = np.array([self.currency_index[currency] for currency in reporting_currencies], dtype=np.intp)
+        rates = self.fx_rates.copy()
+        return FxRates(
+            tuple(self.currencies), rates, self.symbol_currency, reporting, rates[self.symbol_currency], rates[reporting]
+        )
+
+    def price_matrix(self) -> Tuple[List[str], np.ndarray]:
+        """Stored price history as a (time x symbols) array"""
+        symbols = list(self.price_history.keys())
+        length = min(len(self.price_history[symbol]) for symbol in symbols)
+        return symbols, np.column_stack([self.price_history[symbol][-length:] for symbol in symbols])
+
+    def calculate_returns(self, symbol: str) -> np.ndarray:
         """Calculate daily returns for a symbol"""
-        prices = self.price_history[symbol]
-        returns = []
-        for i in range(1, len(prices)):
-            returns.append(math.log(prices[i] / prices[i-1]))
-        return returns
+        return np.diff(np.log(self.price_history[symbol]))
 
     def calculate_metrics(self, symbol: str) -> Dict[str, float]:
         """Calculate risk metrics for a symbol"""
         returns = self.calculate_returns(symbol)
-        if not returns:
+        if len(returns) == 0:
             return {
                 "volatility": 0.0,
                 "var95": 0.0,
@@ -235,24 +313,29 @@ class MarketSimulator:
         var95 = np.percentile(returns, 5) * self.current_prices[symbol]
         var99 = np.percentile(returns, 1) * self.current_prices[symbol]
         
-        # Calculate maximum drawdown
-        prices = self.price_history[symbol]
-        peak = prices[0]
-        max_drawdown = 0.0
-        for price in prices:
-            if price > peak:
-                peak = price
-            drawdown = (peak - price) / peak
-            if drawdown > max_drawdown:
-                max_drawdown = drawdown
-        
         return {
             "volatility": volatility,
             "var95": abs(var95),
             "var99": abs(var99),
-            "max_drawdown": max_drawdown
+            "max_drawdown": float(max_drawdown(np.asarray(self.price_history[symbol])))
         }
 
+    def calculate_symbol_metrics(self, held: np.ndarray) -> Dict[str, np.ndarray]:
+        """Risk metrics of calculate_metrics for all held symbols at once, zero elsewhere"""
+        symbols, prices = self.price_matrix()
+        metrics = {name: np.zeros(len(symbols)) for name in ("volatility", "var95", "var99", "max_drawdown")}
+        if len(prices) < 2 or not held.any():
+            return metrics
+
+        prices = prices[:, held]
+        returns = np.diff(np.log(prices), axis=0)
+        last = prices[-1]
+        metrics["volatility"][held] = np.std(returns, axis=0) * math.sqrt(252)
+        metrics["var95"][held] = np.abs(np.percentile(returns, 5, axis=0) * last)
+        metrics["var99"][held] = np.abs(np.percentile(returns, 1, axis=0) * last)
+        metrics["max_drawdown"][held] = max_drawdown(prices)
+        return metrics
+
     def update_strategy_positions(self, strategy: Strategy) -> None:
         """Update all positions in a strategy with new prices"""
         new_prices = self.current_prices
@@ -327,7 +410,7 @@ class MarketSimulator:
             "exposure": total_exposure,
             "riskLimit": total_exposure * 1.5  # 150% of current exposure
         }
-        logger.debug(f"Calculated metrics for strategy {strategy['name']}: {metrics}")
+        logger.debug("Calculated metrics for strategy %s: %s", strategy["name"], metrics)
         return metrics
 
     async def run_simulation(self, strategies: List[Strategy], broadcast_callback):
@@ -0,0 +1,152 @@
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from models import FxRates, RISK_METRIC_FIELDS, Strategy, StrategyLayout
+from compression import FrameCompressor
+from wire import BinarySchema, layout_key
+
+logger = logging.getLogger(__name__)
+
+
+def encode_json(message: Dict) -> str:
+    """Encode a message the same way Starlette's send_json does"""
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def _frozen(values, dtype=float) -> np.ndarray:
+    array = np.array(values, dtype=dtype)
+    array.flags.writeable = False
+    return array
+
+
+def build_strategies(layouts: Sequence[StrategyLayout], prices: np.ndarray,
+                     selected: np.ndarray, metrics: np.ndarray) -> List[Strategy]:
+    """Strategies as plain dicts, built fresh from snapshot arrays"""
+    strategies = []
+    for j, layout in enumerate(layouts):
+        last_prices = prices[layout.indices].tolist()
+        strategies.append({
+            "id": layout.id,
+            "name": layout.name,
+            "selected": bool(selected[j]),
+            "reportingCurrency": layout.currency,
+            "positions": [{**position, "lastPrice": price} for position, price in zip(layout.positions, last_prices)],
+            "riskMetrics": dict(zip(RISK_METRIC_FIELDS, metrics[j].tolist()))
+        })
+    return strategies
+
+
+@dataclass(frozen=True)
+class TickSnapshot:
+    """Immutable, versioned state of the book after one tick.
+
+    Arrays are read-only and the wire messages are encoded up front, so any
+    reader holding a reference can use it without locks or copies while the
+    pipeline publishes the next one.
+    """
+    version: int
+    server_time: float                   # Unix time the snapshot was published
+    symbols: Tuple[str, ...]
+    prices: np.ndarray                   # Last price per symbol
+    layouts: Tuple[StrategyLayout, ...]
+    selected: np.ndarray                 # Selected flag per strategy
+    metrics: np.ndarray                  # Strategies x RISK_METRIC_FIELDS
+    symbol_metrics: Dict[str, np.ndarray]  # Per-symbol risk the metrics were computed from
+    fx: FxRates
+    schema: BinarySchema
+    initial_text: str
+    update_text: str
+    schema_text: str
+    update_binary: bytes
+    deflated_frames: Dict[str, Optional[bytes]] = field(default_factory=dict, compare=False)
+
+    @property
+    def price_map(self) -> Dict[str, float]:
+        return dict(zip(self.symbols, self.prices.tolist()))
+
+    @property
+    def fx_map(self) -> Dict[str, float]:
+        return dict(zip(self.fx.currencies, self.fx.rates.tolist()))
+
+    def strategies(self) -> List[Strategy]:
+        return build_strategies(self.layouts, self.prices, self.selected, self.metrics)
+
+
+class SnapshotCache:
+    """Publishes TickSnapshots and holds the current one.
+
+    The tick pipeline calls ``publish`` once per tick; every client write in
+    between reuses the encoded messages of ``current`` instead of serializing
+    the live state again. Publishing is a single reference swap.
+    """
+
+    def __init__(self, compressor: Optional[FrameCompressor] = None):
+        self.compressor = compressor or FrameCompressor()
+        self.current: Optional[TickSnapshot] = None
+        self._schema: Optional[BinarySchema] = None
+        self._schema_text = ""
+
+    @property
+    def version(self) -> int:
+        return self.current.version if self.current else 0
+
+    def publish(self, symbols: Sequence[str], prices: np.ndarray, layouts: Tuple[StrategyLayout, ...],
+                selected: np.ndarray, metrics: np.ndarray, symbol_metrics: Dict[str, np.ndarray],
+                fx: FxRates) -> TickSnapshot:
+        """Freeze and encode the state of one tick, then make it current"""
+        version = self.version + 1
+        server_time = time.time()
+        symbols = tuple(symbols)
+        prices = _frozen(prices)
+        selected = _frozen(selected, dtype=bool)
+        metrics = _frozen(metrics)
+        symbol_metrics = {name: _frozen(values) for name, values in symbol_metrics.items()}
+        fx = FxRates(
+            tuple(fx.currencies), _frozen(fx.rates), _frozen(fx.symbol_currency, dtype=np.intp),
+            _frozen(fx.reporting_currency, dtype=np.intp), _frozen(fx.symbol_fx), _frozen(fx.reporting_fx)
+        )
+
+        # Compact frame for binary clients, the schema only changes with the book layout
+        schema = self._schema
+        if schema is None or schema.key != layout_key(symbols, fx.currencies, layouts):
+            schema = BinarySchema(schema.version + 1 if schema else 1, symbols, fx.currencies, layouts)
+            self._schema = schema
+            self._schema_text = encode_json(schema.to_message())
+
+        data_text = encode_json({
+            "version": version,
+            "serverTime": server_time,
+            "prices": dict(zip(symbols, prices.tolist())),
+            "fxRates": dict(zip(fx.currencies, fx.rates.tolist())),
+            "strategies": build_strategies(layouts, prices, selected, metrics)
+        })
+        snapshot = TickSnapshot(
+            version=version,
+            server_time=server_time,
+            symbols=symbols,
+            prices=prices,
+            layouts=layouts,
+            selected=selected,
+            metrics=metrics,
+            symbol_metrics=symbol_metrics,
+            fx=fx,
+            schema=schema,
+            # Both messages share the same payload, only the envelope differs
+            initial_text='{"type":"initial","data":' + data_text + '}',
+            update_text='{"type":"update","data":' + data_text + '}',
+            schema_text=self._schema_text,
+            update_binary=schema.encode(version, server_time, prices, fx.rates, selected, metrics)
+        )
+        self.current = snapshot
+        logger.debug("Snapshot v%d published (%d bytes)", version, len(data_text))
+        return snapshot
+
+    def deflated(self, snapshot: TickSnapshot, name: str) -> Optional[bytes]:
+        """Compressed frame for an encoded text message, built at most once per snapshot"""
+        frames = snapshot.deflated_frames
+        if name not in frames:
+            frames[name] = self.compressor.compress(getattr(snapshot, name))
+        return frames[name]
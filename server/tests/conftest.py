@@ -0,0 +1,32 @@
+import os
+import sys
+from typing import Sequence
+import numpy as np
+import pytest
+
+# The server modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import BASE_CURRENCY, StrategyLayout  # noqa: E402
+from factories import SYMBOLS, position  # noqa: E402
+
+
+@pytest.fixture
+def make_layout():
+    """Build a frozen StrategyLayout from symbol indices into SYMBOLS and quantities"""
+    def make(strategy_id: int, indices: Sequence[int], quantities: Sequence[float],
+             currency: str = BASE_CURRENCY, price: float = 100.0) -> StrategyLayout:
+        positions = tuple(position(SYMBOLS[i], q, price) for i, q in zip(indices, quantities))
+        return StrategyLayout(
+            id=strategy_id,
+            name=f"Strategy {strategy_id}",
+            positions=positions,
+            indices=np.array(indices, dtype=np.intp),
+            quantities=np.array(quantities, dtype=float),
+            opening_prices=np.full(len(positions), price),
+            entry_prices=np.full(len(positions), price),
+            opening_fx=np.ones(len(positions)),
+            entry_fx=np.ones(len(positions)),
+            currency=currency
+        )
+    return make
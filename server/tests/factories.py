@@ -0,0 +1,26 @@
+"""Sample book definitions shared by the tests"""
+
+SYMBOLS = ["AAPL", "MSFT", "GOOGL"]
+
+
+def instrument(symbol: str, currency: str = "USD"):
+    return {
+        "internalCode": symbol,
+        "bloombergTicker": f"{symbol} US",
+        "reutersTicker": f"{symbol}.O",
+        "instrumentType": "Equity",
+        "currency": currency,
+        "assetClass": "Technology"
+    }
+
+
+def position(symbol: str, quantity: float, price: float, entry_price: float = None):
+    return {
+        "instrument": instrument(symbol),
+        "quantity": quantity,
+        "dailyPnL": 0.0,
+        "totalPnL": 0.0,
+        "lastPrice": price,
+        "openingPrice": price,
+        "entryPrice": entry_price if entry_price is not None else price
+    }
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from backtest import run_backtest
+from factories import SYMBOLS, position
+
+
+@pytest.fixture
+def strategies():
+    return [{"id": 1, "name": "Growth", "positions": [position("AAPL", 10, 100.0), position("MSFT", -5, 100.0)]}]
+
+
+@pytest.fixture
+def prices():
+    rng = np.random.default_rng(3)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, (60, len(SYMBOLS))), axis=0))
+
+
+def test_backtest_counts_exceptions(strategies, prices):
+    result, = run_backtest(strategies, SYMBOLS, prices, window=20, confidences=(0.95,))
+    stats = result["results"]["0.95"]
+    pnl = np.diff(prices, axis=0) @ np.array([10.0, -5.0, 0.0])
+    assert stats["observations"] == len(pnl) - 20
+    assert stats["expectedExceptions"] == pytest.approx(0.05 * (len(pnl) - 20))
+
+
+@pytest.mark.parametrize("window", [0, -1, 59])
+def test_backtest_rejects_bad_window(strategies, prices, window):
+    with pytest.raises(ValueError):
+        run_backtest(strategies, SYMBOLS, prices, window=window)
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from book import Book, TradeError, revalue
+from factories import SYMBOLS, instrument, position
+from models import FxRates, RISK_METRIC_FIELDS, Trade
+
+PRICES = {"AAPL": 180.0, "MSFT": 350.0, "GOOGL": 140.0}
+
+
+@pytest.fixture
+def book():
+    strategies = [{
+        "id": 1,
+        "name": "Growth",
+        "selected": False,
+        "reportingCurrency": "USD",
+        "positions": [position("AAPL", 100, 180.0, entry_price=150.0)],
+        "riskMetrics": {}
+    }]
+    return Book(strategies, {symbol: instrument(symbol) for symbol in SYMBOLS}, SYMBOLS)
+
+
+def book_trade(book, **trade):
+    return book.book_trade(Trade(strategyId=1, **trade), PRICES, PRICES)
+
+
+def test_add_averages_entry_price(book):
+    result = book_trade(book, symbol="AAPL", quantity=100, price=170.0)
+    assert result["quantity"] == 200
+    assert result["entryPrice"] == pytest.approx(160.0)
+
+
+def test_reducing_keeps_entry_price(book):
+    result = book_trade(book, symbol="AAPL", quantity=-40, price=200.0)
+    assert result["quantity"] == 60
+    assert result["entryPrice"] == 150.0
+
+
+def test_flip_enters_remainder_at_fill_price(book):
+    result = book_trade(book, symbol="AAPL", quantity=-150, price=190.0)
+    assert result["quantity"] == -50
+    assert result["entryPrice"] == 190.0
+
+
+def test_add_opens_position_at_last_price(book):
+    result = book_trade(book, symbol="MSFT", quantity=10)
+    assert result["quantity"] == 10
+    assert result["entryPrice"] == PRICES["MSFT"]
+    assert [layout.codes for layout in book.layouts()] == [("AAPL", "MSFT")]
+
+
+@pytest.mark.parametrize("quantity", [None, 0])
+def test_add_requires_quantity(book, quantity):
+    with pytest.raises(TradeError):
+        book_trade(book, symbol="AAPL", quantity=quantity)
+
+
+@pytest.mark.parametrize("field", ["quantity", "price"])
+@pytest.mark.parametrize("value", ["NaN", "Infinity", "-Infinity"])
+def test_trade_rejects_non_finite_values(field, value):
+    with pytest.raises(ValidationError):
+        Trade.model_validate_json(f'{{"strategyId": 1, "symbol": "AAPL", "quantity": 1, "{field}": {value}}}')
+
+
+def test_price_only_amend_keeps_quantity(book):
+    result = book_trade(book, symbol="AAPL", action="amend", price=160.0)
+    assert result["quantity"] == 100
+    assert result["entryPrice"] == 160.0
+
+
+def test_amend_sets_quantity(book):
+    result = book_trade(book, symbol="AAPL", action="amend", quantity=40)
+    assert result["quantity"] == 40
+    assert result["entryPrice"] == 150.0
+
+
+def test_amend_needs_quantity_or_price(book):
+    with pytest.raises(TradeError):
+        book_trade(book, symbol="AAPL", action="amend")
+
+
+@pytest.mark.parametrize("trade", [{"action": "close"}, {"action": "amend", "quantity": 0}])
+def test_close_removes_position(book, trade):
+    assert book_trade(book, symbol="AAPL", **trade) is None
+    assert book.get_strategy(1)["positions"] == []
+    layout, = book.layouts()
+    assert len(layout.indices) == 0
+    assert not book.held.any()
+
+
+def test_unknown_strategy_and_instrument_are_rejected(book):
+    with pytest.raises(TradeError):
+        book.book_trade(Trade(strategyId=9, symbol="AAPL", quantity=1), PRICES, PRICES)
+    with pytest.raises(TradeError):
+        book_trade(book, symbol="XXX", quantity=1)
+    with pytest.raises(TradeError):
+        book_trade(book, symbol="MSFT", action="close")
+
+
+def test_revalue_pnl_and_parametric_var(make_layout):
+    layouts = (make_layout(1, [0, 1], [10, -5], price=100.0), make_layout(2, [], []))
+    prices = np.array([110.0, 90.0, 50.0])
+    symbol_metrics = {name: np.zeros(3) for name in ("volatility", "var95", "var99", "max_drawdown")}
+    metrics = revalue(layouts, prices, symbol_metrics, volatility=np.array([100.0, 0.0]))
+    columns = {field: i for i, field in enumerate(RISK_METRIC_FIELDS)}
+    assert metrics[0, columns["exposure"]] == pytest.approx(1100.0 + 450.0)
+    assert metrics[0, columns["dailyPnL"]] == pytest.approx(10 * 10.0 - 5 * -10.0)
+    assert metrics[0, columns["var99"]] == pytest.approx(232.6347874)
+    assert metrics[1, columns["var99"]] == 0.0
+
+
+def test_pnl_includes_fx_translation():
+    """A EUR-reporting strategy holding a USD stock makes money when the dollar rallies"""
+    strategies = [{"id": 1, "name": "Neutral", "selected": False, "reportingCurrency": "EUR",
+                   "positions": [position("AAPL", 100, 180.0, entry_price=150.0)], "riskMetrics": {}}]
+    book = Book(strategies, {symbol: instrument(symbol) for symbol in SYMBOLS}, SYMBOLS, {"USD": 1.0, "EUR": 1.25})
+    assert strategies[0]["positions"][0]["entryFx"] == pytest.approx(0.8)
+
+    # A fill at 200 while EUR is at 1.0, the entry rate is averaged over the cost
+    book.book_trade(Trade(strategyId=1, symbol="AAPL", quantity=100, price=200.0), PRICES, PRICES,
+                    {"USD": 1.0, "EUR": 1.0})
+    held = strategies[0]["positions"][0]
+    assert held["entryPrice"] * held["entryFx"] * 200 == pytest.approx(100 * 150.0 * 0.8 + 100 * 200.0)
+
+    rates = np.array([1.0, 1.0])
+    fx = FxRates(("USD", "EUR"), rates, np.zeros(3, dtype=np.intp), np.array([1]), np.ones(3), rates[[1]])
+    layout, = book.layouts()
+    metrics = revalue((layout,), np.array([180.0, 350.0, 140.0]), {
+        name: np.zeros(3) for name in ("volatility", "var95", "var99", "max_drawdown")
+    }, fx=fx)
+    columns = {field: i for i, field in enumerate(RISK_METRIC_FIELDS)}
+    # Unchanged price, the whole P&L of the day is the move from the opening rate
+    assert metrics[0, columns["dailyPnL"]] == pytest.approx(200 * 180.0 * (1.0 - 0.8))
+    assert metrics[0, columns["totalPnL"]] == pytest.approx(200 * 180.0 - (100 * 150.0 * 0.8 + 100 * 200.0))
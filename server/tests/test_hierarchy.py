@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from hierarchy import Hierarchy
+from limits import LimitConfigError, LimitEngine
+from models import FxRates, RISK_METRIC_FIELDS
+
+
+def test_desk_membership_comes_from_hierarchy(make_layout):
+    hierarchy = Hierarchy({"desks": {"Equity": {"Core": [1], "Value": [2]}, "Macro": {"Rates": [3]}}})
+    assert hierarchy.desk_strategies == {"Equity": [1, 2], "Macro": [3]}
+
+    engine = LimitEngine(
+        {"limits": [{"scope": "desk", "entity": "*", "metric": "exposure", "limit": 1e6}]}, hierarchy.desk_strategies
+    )
+    layouts = (make_layout(1, [0], [1]), make_layout(2, [1], [2]), make_layout(3, [2], [4]))
+    engine.evaluate(1, layouts, np.array([100.0, 100.0, 100.0]), np.zeros((3, len(RISK_METRIC_FIELDS))))
+    values = {limit["entity"]: limit["value"] for limit in engine.status()}
+    assert values == {"Equity": pytest.approx(300.0), "Macro": pytest.approx(400.0)}
+
+
+def test_desks_in_limit_config_are_rejected():
+    with pytest.raises(LimitConfigError):
+        LimitEngine({"desks": {"Equity": [1]}, "limits": []})
+
+
+def test_rollup_pnl_and_var_match_strategy_metrics(make_layout):
+    hierarchy = Hierarchy({"firm": "Firm", "desks": {"Equity": {"Core": [1, 2]}}})
+    layouts = (make_layout(1, [0], [1]), make_layout(2, [1], [2], currency="EUR"), make_layout(3, [2], [4]))
+    rates = np.array([1.0, 1.1])
+    fx = FxRates(("USD", "EUR"), rates, np.zeros(3, dtype=np.intp), np.array([0, 1, 0]), np.ones(3), rates[[0, 1, 0]])
+    metrics = np.zeros((3, len(RISK_METRIC_FIELDS)))
+    metrics[:, RISK_METRIC_FIELDS.index("dailyPnL")] = [10.0, 20.0, 40.0]
+    metrics[:, RISK_METRIC_FIELDS.index("totalPnL")] = [1.0, 2.0, 4.0]
+    metrics[:, RISK_METRIC_FIELDS.index("var99")] = [5.0, 6.0, 7.0]
+    nodes = {node["nodeId"]: node for node in hierarchy.update(1, layouts, np.full(3, 100.0), metrics, fx)}
+    assert nodes["desk:Equity"]["dailyPnL"] == pytest.approx(10.0 + 20.0 * 1.1)
+    assert nodes["strategy:2"]["totalPnL"] == pytest.approx(2.0 * 1.1)
+    assert nodes["firm"]["dailyPnL"] == pytest.approx(10.0 + 22.0 + 40.0)
+    assert nodes["firm"]["exposure"] == pytest.approx(100.0 + 200.0 + 400.0)
+    assert nodes["desk:Equity"]["var99"] == pytest.approx(5.0 + 6.0 * 1.1)
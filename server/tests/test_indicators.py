@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from indicators import (
+    EwmaCovariance, RollingIndicators, ewma_covariance, ewma_volatility, log_returns, max_drawdown, momentum,
+    rolling_beta, rolling_correlation, rolling_drawdown
+)
+
+WINDOW = 50
+LOOKBACK = 10
+
+
+@pytest.fixture(scope="module")
+def history():
+    rng = np.random.default_rng(7)
+    market = rng.normal(0.0, 0.01, 200)
+    returns = 1.2 * market[:, None] + rng.normal(0.0, 0.02, (200, 4))
+    prices = 100.0 * np.exp(np.vstack((np.zeros(4), np.cumsum(returns, axis=0))))
+    return prices, market
+
+
+@pytest.fixture(scope="module")
+def rolling(history):
+    prices, market = history
+    indicators = RollingIndicators(["A", "B", "C", "D"], prices[0], window=WINDOW, momentum_lookback=LOOKBACK)
+    for tick in range(1, len(prices)):
+        indicators.update(prices[tick], market[tick - 1])
+    return indicators
+
+
+def test_incremental_matches_batch(history, rolling):
+    prices, market = history
+    returns = log_returns(prices)
+    np.testing.assert_allclose(rolling.momentum, momentum(returns, LOOKBACK)[-1])
+    np.testing.assert_allclose(rolling.ewma_volatility, ewma_volatility(returns)[-1])
+    np.testing.assert_allclose(rolling.drawdown, rolling_drawdown(prices, WINDOW)[-1])
+    np.testing.assert_allclose(rolling.max_drawdown, max_drawdown(prices))
+    np.testing.assert_allclose(rolling.beta, rolling_beta(returns, market, WINDOW)[-1])
+    np.testing.assert_allclose(rolling.correlation, rolling_correlation(returns, WINDOW)[-1], atol=1e-12)
+
+
+def test_ewma_covariance_matches_batch(history):
+    returns = log_returns(history[0])
+    initial = np.diag([1e-4, 2e-4, 3e-4, 4e-4])
+    estimate = EwmaCovariance(4, decay=0.9, initial=initial)
+    for r in returns:
+        estimate.update(r)
+    np.testing.assert_allclose(estimate.raw, ewma_covariance(returns, 0.9, initial))
+    factor = estimate.factor
+    np.testing.assert_allclose(factor @ factor.T, estimate.covariance)
+
+
+def test_ewma_covariance_shrinkage_and_rank(history):
+    returns = log_returns(history[0])
+    shrunk = EwmaCovariance(4, shrinkage=0.5)
+    truncated = EwmaCovariance(4, rank=2)
+    for r in returns:
+        shrunk.update(r)
+        truncated.update(r)
+    raw = shrunk.raw
+    np.testing.assert_allclose(np.diag(shrunk.covariance), np.diag(raw))
+    np.testing.assert_allclose(shrunk.covariance[0, 1], 0.5 * raw[0, 1])
+    # Low rank keeps every symbol's own variance through the specific part, the loadings stay narrow
+    assert truncated.factor.shape == (4, 2)
+    assert truncated.specific.shape == (4,)
+    np.testing.assert_allclose(np.diag(truncated.covariance), np.diag(truncated.raw))
+    np.testing.assert_array_equal(shrunk.specific, np.zeros(4))
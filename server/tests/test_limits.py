@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from limits import LIMIT_METRICS, LimitEngine
+from models import RISK_METRIC_FIELDS
+
+CONCENTRATION = LIMIT_METRICS.index("concentration")
+
+
+def concentration_engine():
+    return LimitEngine({"limits": [{"scope": "strategy", "entity": "*", "metric": "concentration", "limit": 0.75}]})
+
+
+def metrics(n):
+    return np.zeros((n, len(RISK_METRIC_FIELDS)))
+
+
+@pytest.mark.parametrize("order", [(0, 1), (1, 0)])
+def test_concentration_next_to_empty_strategy(make_layout, order):
+    held = make_layout(1, [0, 1], [10, 100])
+    empty = make_layout(2, [], [])
+    layouts = tuple((held, empty)[i] for i in order)
+    prices = np.array([180.0, 350.0, 140.0])
+    values = concentration_engine().values(layouts, prices, metrics(2))
+    concentration = dict(zip([layout.id for layout in layouts], values[:, CONCENTRATION]))
+    assert concentration[1] == pytest.approx(35000.0 / 36800.0)
+    assert concentration[2] == 0.0
+
+
+def test_concentration_with_empty_strategies_between(make_layout):
+    layouts = (make_layout(1, [], []), make_layout(2, [2], [5]), make_layout(3, [], []),
+               make_layout(4, [0, 1, 2], [1, 2, 1]), make_layout(5, [], []))
+    prices = np.array([100.0, 100.0, 100.0])
+    values = concentration_engine().values(layouts, prices, metrics(5))
+    np.testing.assert_allclose(values[:, CONCENTRATION], [0.0, 1.0, 0.0, 0.5, 0.0])
+
+
+def test_all_strategies_empty(make_layout):
+    layouts = (make_layout(1, [], []), make_layout(2, [], []))
+    values = concentration_engine().values(layouts, np.ones(3), metrics(2))
+    np.testing.assert_array_equal(values[:, CONCENTRATION], [0.0, 0.0])
+
+
+def test_breach_clears_below_hysteresis_band(make_layout):
+    engine = LimitEngine({
+        "hysteresis": 0.05,
+        "limits": [{"scope": "strategy", "entity": 1, "metric": "exposure", "limit": 1000}]
+    })
+    layouts = (make_layout(1, [0], [1]),)
+
+    def evaluate(version, price):
+        events = engine.evaluate(version, layouts, np.array([price, 1.0, 1.0]), metrics(1))
+        return [event["event"] for event in events]
+
+    assert evaluate(1, 990.0) == []
+    assert evaluate(2, 1010.0) == ["breach"]
+    assert evaluate(3, 970.0) == []           # Inside the band, still breached
+    assert engine.status()[0]["breached"]
+    assert evaluate(4, 940.0) == ["clear"]
+    assert evaluate(5, 990.0) == []           # Below the limit, no new breach
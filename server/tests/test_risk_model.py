@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from scipy.stats import norm
+from models import FxRates, Trade
+from risk_model import RiskModel
+
+SYMBOLS = ["AAPL", "MSFT", "GOOGL"]
+PRICES = np.array([180.0, 350.0, 140.0])
+CURRENCIES = ("USD", "EUR")
+
+# Symbols then EUR, per-tick returns
+COVARIANCE = np.array([
+    [4.0, 2.0, 1.0, 0.2],
+    [2.0, 3.0, 1.5, 0.1],
+    [1.0, 1.5, 5.0, 0.0],
+    [0.2, 0.1, 0.0, 0.5]
+]) * 1e-4
+
+
+def fx_rates(reporting):
+    rates = np.array([1.0, 1.1])
+    symbol_currency = np.zeros(len(SYMBOLS), dtype=np.intp)
+    reporting = np.array(reporting, dtype=np.intp)
+    return FxRates(CURRENCIES, rates, symbol_currency, reporting, rates[symbol_currency], rates[reporting])
+
+
+@pytest.fixture
+def model(make_layout):
+    layouts = (make_layout(1, [0, 1], [100, -50]), make_layout(2, [0, 2], [10, 20], currency="EUR"))
+    model = RiskModel()
+    model.update(1, np.linalg.cholesky(COVARIANCE), 1, layouts, PRICES, fx_rates([0, 1]))
+    return model
+
+
+def what_if(model, *trades, **kwargs):
+    return model.what_if([Trade(**trade) for trade in trades], SYMBOLS, PRICES, **kwargs)
+
+
+def brute_force_var(quantities, reporting_rate, confidence=0.99):
+    """z * sqrt(e' C e), the position also loading negatively on a EUR reporting currency"""
+    exposures = np.asarray(quantities, dtype=float) * PRICES / reporting_rate
+    e = np.append(exposures, -exposures.sum() if reporting_rate != 1.0 else 0.0)
+    return norm.ppf(confidence) * np.sqrt(e @ COVARIANCE @ e)
+
+
+def test_var_matches_covariance(model):
+    usd, eur = what_if(model, {"strategyId": 1, "symbol": "GOOGL", "quantity": 30},
+                       {"strategyId": 2, "symbol": "MSFT", "quantity": -5})
+    assert usd["before"]["var"] == pytest.approx(brute_force_var([100, -50, 0], 1.0))
+    assert usd["after"]["var"] == pytest.approx(brute_force_var([100, -50, 30], 1.0))
+    assert eur["currency"] == "EUR"
+    assert eur["before"]["var"] == pytest.approx(brute_force_var([10, 0, 20], 1.1))
+    assert eur["after"]["var"] == pytest.approx(brute_force_var([10, -5, 20], 1.1))
+
+
+@pytest.mark.parametrize("strategy_id", [1, 2])
+def test_component_var_sums_to_var(model, strategy_id):
+    scenario, = what_if(model, {"strategyId": strategy_id, "symbol": "MSFT", "quantity": 20}, confidence=0.95)
+    components = sum(position["componentVar"] for position in scenario["positions"])
+    assert components == pytest.approx(scenario["after"]["var"])
+
+
+def test_combined_trades_share_a_scenario(model):
+    trades = ({"strategyId": 1, "symbol": "AAPL", "quantity": 10}, {"strategyId": 1, "symbol": "AAPL", "quantity": -10})
+    combined, = what_if(model, *trades)
+    assert combined["trades"] == [0, 1]
+    assert combined["change"]["var"] == pytest.approx(0.0)
+    assert len(what_if(model, *trades, combined=False)) == 2
+
+
+def test_price_only_amend_leaves_risk_unchanged(model):
+    scenario, = what_if(model, {"strategyId": 1, "symbol": "AAPL", "action": "amend", "price": 100.0})
+    assert scenario["change"] == {"exposure": 0.0, "netExposure": 0.0, "volatility": 0.0, "var": 0.0}
+
+
+def test_amend_and_close_change_quantity(model):
+    amend, = what_if(model, {"strategyId": 1, "symbol": "AAPL", "action": "amend", "quantity": 40})
+    assert amend["after"]["var"] == pytest.approx(brute_force_var([40, -50, 0], 1.0))
+    close, = what_if(model, {"strategyId": 1, "symbol": "MSFT", "action": "close"})
+    assert [position["symbol"] for position in close["positions"]] == ["AAPL"]
+
+
+def test_invalid_trades_are_rejected(model):
+    with pytest.raises(ValueError):
+        what_if(model, {"strategyId": 1, "symbol": "AAPL"})
+    with pytest.raises(ValueError):
+        what_if(model, {"strategyId": 9, "symbol": "AAPL", "quantity": 1})
+    with pytest.raises(ValueError):
+        what_if(model, {"strategyId": 1, "symbol": "XXX", "quantity": 1})
+
+
+def test_truncated_factor_model_matches_its_covariance(make_layout):
+    """Loadings and specific variances give the same VaR as the dense covariance they model"""
+    values, vectors = np.linalg.eigh(COVARIANCE)
+    loadings = vectors[:, -2:] * np.sqrt(values[-2:])
+    specific = np.diag(COVARIANCE) - np.sum(loadings ** 2, axis=1)
+    modelled = loadings @ loadings.T + np.diag(specific)
+
+    truncated = RiskModel()
+    layouts = (make_layout(1, [0, 1], [100, -50]), make_layout(2, [0, 2], [10, 20], currency="EUR"))
+    truncated.update(1, loadings, 1, layouts, PRICES, fx_rates([0, 1]), specific)
+    dense = RiskModel()
+    dense.update(1, np.linalg.cholesky(modelled), 1, layouts, PRICES, fx_rates([0, 1]))
+
+    np.testing.assert_allclose(truncated.volatility, dense.volatility)
+    trade = {"strategyId": 2, "symbol": "MSFT", "quantity": -5}
+    scenario, = what_if(truncated, trade)
+    expected, = what_if(dense, trade)
+    assert scenario["after"]["var"] == pytest.approx(expected["after"]["var"])
+    for position, dense_position in zip(scenario["positions"], expected["positions"]):
+        assert position["componentVar"] == pytest.approx(dense_position["componentVar"])
+    assert sum(p["componentVar"] for p in scenario["positions"]) == pytest.approx(scenario["after"]["var"])
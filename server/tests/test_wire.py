@@ -0,0 +1,63 @@
+import json
+import zlib
+import numpy as np
+import pytest
+from compression import FrameCompressor
+from models import FxRates
+from snapshot import SnapshotCache
+from wire import FRAME_DEFLATE, FRAME_PREFIX_SIZE, FRAME_UPDATE
+
+SYMBOLS = ("AAPL", "MSFT", "GOOGL")
+
+
+def decode_frame(frame: bytes, schema: dict) -> dict:
+    """Decode an update frame the way the client does, walking the schema"""
+    assert frame[0] == FRAME_UPDATE
+    values = iter(np.frombuffer(frame, "<f8", offset=FRAME_PREFIX_SIZE).tolist())
+    decoded = {field: next(values) for field in schema["header"]}
+    decoded["prices"] = {symbol: next(values) for symbol in schema["symbols"]}
+    decoded["fxRates"] = {currency: next(values) for currency in schema["currencies"]}
+    decoded["strategies"] = []
+    for strategy in schema["strategies"]:
+        fields = {field: next(values) for field in schema["strategyFields"]}
+        positions = [{field: next(values) for field in schema["positionFields"]} for _ in strategy["positions"]]
+        decoded["strategies"].append({"id": strategy["id"], **fields, "positions": positions})
+    assert next(values, None) is None
+    return decoded
+
+
+@pytest.fixture
+def snapshot(make_layout):
+    layouts = (make_layout(1, [0, 1], [100, -50]), make_layout(2, [], []), make_layout(3, [2], [7], currency="EUR"))
+    rates = np.array([1.0, 1.08])
+    fx = FxRates(("USD", "EUR"), rates, np.zeros(3, dtype=np.intp), np.array([0, 0, 1]), np.ones(3), rates[[0, 0, 1]])
+    metrics = np.arange(3 * 8, dtype=float).reshape(3, 8) + 0.5
+    cache = SnapshotCache(FrameCompressor(threshold=0))
+    return cache, cache.publish(SYMBOLS, np.array([180.5, 350.25, 140.125]), layouts,
+                                np.array([True, False, True]), metrics, {}, fx)
+
+
+def test_binary_frame_round_trip(snapshot):
+    _, snapshot = snapshot
+    schema = json.loads(snapshot.schema_text)["data"]
+    decoded = decode_frame(snapshot.update_binary, schema)
+    update = json.loads(snapshot.update_text)["data"]
+
+    assert decoded["schemaVersion"] == schema["schemaVersion"]
+    assert decoded["version"] == update["version"]
+    assert decoded["serverTime"] == update["serverTime"]
+    assert decoded["prices"] == update["prices"]
+    assert decoded["fxRates"] == update["fxRates"]
+    for frame_strategy, strategy in zip(decoded["strategies"], update["strategies"]):
+        assert frame_strategy["id"] == strategy["id"]
+        assert bool(frame_strategy["selected"]) == strategy["selected"]
+        assert {field: frame_strategy[field] for field in strategy["riskMetrics"]} == strategy["riskMetrics"]
+        assert [p["lastPrice"] for p in frame_strategy["positions"]] == [p["lastPrice"] for p in strategy["positions"]]
+
+
+def test_deflated_text_round_trip(snapshot):
+    cache, snapshot = snapshot
+    frame = cache.deflated(snapshot, "update_text")
+    assert frame[0] == FRAME_DEFLATE
+    assert zlib.decompress(frame[FRAME_PREFIX_SIZE:]).decode() == snapshot.update_text
+    assert cache.deflated(snapshot, "update_text") is frame
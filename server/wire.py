@@ -0,0 +1,86 @@
+import struct
+from typing import Dict, Sequence, Tuple
+import numpy as np
+from models import RISK_METRIC_FIELDS, StrategyLayout
+
+# Encodings a client can negotiate with ``/ws?encoding=...``
+ENCODING_JSON = "json"
+ENCODING_BINARY = "binary"
+ENCODINGS = (ENCODING_JSON, ENCODING_BINARY)
+
+# Binary frames start with an 8-byte prefix: frame kind + padding, which keeps
+# the float64 payload aligned for a zero-copy Float64Array on the client
+FRAME_UPDATE = 1
+FRAME_DEFLATE = 2  # zlib-wrapped deflate stream of a JSON message
+FRAME_PREFIX_SIZE = 8
+
+HEADER_FIELDS = ["schemaVersion", "version", "serverTime"]
+STRATEGY_FIELDS = ["selected", *RISK_METRIC_FIELDS]
+POSITION_FIELDS = ["lastPrice"]
+
+
+def frame_prefix(kind: int) -> bytes:
+    """Build the fixed-size prefix of a binary frame"""
+    return struct.pack("<B7x", kind)
+
+
+def layout_key(symbols: Sequence[str], currencies: Sequence[str], layouts: Sequence[StrategyLayout]) -> Tuple:
+    """Identify the frame layout; a new key means clients need a new schema"""
+    return tuple(symbols), tuple(currencies), tuple((layout.id, layout.codes) for layout in layouts)
+
+
+class BinarySchema:
+    """Fixed float64 layout of an update frame.
+
+    Frame payload, after the prefix, in order:
+    header fields, one price per symbol, one FX rate per currency, then for every strategy its
+    STRATEGY_FIELDS followed by POSITION_FIELDS for each of its positions.
+    The layout is precomputed as a gather index, so encoding a frame is a
+    single fancy-indexing operation over the snapshot arrays.
+    """
+
+    def __init__(self, version: int, symbols: Sequence[str], currencies: Sequence[str],
+                 layouts: Sequence[StrategyLayout]):
+        self.version = version
+        self.key = layout_key(symbols, currencies, layouts)
+        self.symbols = list(symbols)
+        self.currencies = list(currencies)
+        self.strategies = [{"id": layout.id, "positions": list(layout.codes)} for layout in layouts]
+
+        # Source vector: header, prices, FX rates, then one STRATEGY_FIELDS row per
+        # strategy. The only position field is lastPrice, gathered from the prices.
+        header_size = len(HEADER_FIELDS)
+        width = len(STRATEGY_FIELDS)
+        strategy_base = header_size + len(self.symbols) + len(self.currencies)
+        gather = list(range(strategy_base))
+        for j, layout in enumerate(layouts):
+            gather.extend(range(strategy_base + j * width, strategy_base + (j + 1) * width))
+            gather.extend((header_size + layout.indices).tolist())
+        self._gather = np.array(gather, dtype=np.intp)
+        self.size = len(self._gather)
+
+    def to_message(self) -> Dict:
+        """Schema message sent to binary clients before any update frame"""
+        return {
+            "type": "schema",
+            "data": {
+                "schemaVersion": self.version,
+                "header": HEADER_FIELDS,
+                "symbols": self.symbols,
+                "currencies": self.currencies,
+                "strategyFields": STRATEGY_FIELDS,
+                "positionFields": POSITION_FIELDS,
+                "strategies": self.strategies
+            }
+        }
+
+    def encode(self, version: int, server_time: float, prices: np.ndarray, fx_rates: np.ndarray,
+               selected: np.ndarray, metrics: np.ndarray) -> bytes:
+        """Pack prices, FX rates and risk metrics (strategies x RISK_METRIC_FIELDS) into a binary update frame"""
+        source = np.concatenate((
+            [self.version, version, server_time],
+            prices,
+            fx_rates,
+            np.column_stack((selected, metrics)).ravel()
+        ))
+        return frame_prefix(FRAME_UPDATE) + source[self._gather].astype("<f8").tobytes()